@@ -0,0 +1,278 @@
+"""Per-level and per-challenge time_taken / attempts distributions.
+
+Every GameProgress save adds its time_taken and attempts to log-linear
+histograms for its level and for the challenge at that level. The
+histograms are stored as one AnalyticsBucket row per non-empty bucket, and
+a save increments its buckets with a single upsert in the same
+transaction. Nothing is read back, and concurrent workers cannot lose
+updates.
+
+Buckets are exact below 16 and hold 8 sub-buckets per power of two above
+that, so a quantile read from them is within 12.5% of the true value.
+Histograms merge by adding bucket counts, so a distribution for several
+levels or workers is just a sum. Reading a level costs the same however
+many saves it has, because the number of buckets is bounded.
+
+backfill() rebuilds every histogram from the game_progress table and its
+archive partitions in chunks, computing bucket indexes and counts with
+vectorized NumPy passes:
+
+    flask --app "app:create_app()" backfill-analytics
+"""
+import itertools
+
+from flask import Blueprint, current_app, jsonify, session
+
+from catalog import catalog
+from db_routing import read_only
+from models import db, AnalyticsBucket, Challenge, GameProgress
+
+METRICS = ('time_taken', 'attempts')
+QUANTILES = (0.5, 0.9, 0.99)
+DEFAULT_CHUNK_SIZE = 50000
+
+# Values below EXACT_LIMIT get their own bucket; above it each power of two
+# is split into SUB_BUCKETS equal-width buckets
+SUB_BUCKETS = 8
+EXACT_LIMIT = 2 * SUB_BUCKETS
+_SUB_BITS = SUB_BUCKETS.bit_length() - 1
+_FIRST_EXPONENT = EXACT_LIMIT.bit_length() - 1
+
+def bucket_of(value):
+    """Bucket index for a non-negative integer value"""
+    value = max(int(value), 0)
+    if value < EXACT_LIMIT:
+        return value
+    exponent = value.bit_length() - 1
+    shift = exponent - _SUB_BITS
+    return EXACT_LIMIT + (exponent - _FIRST_EXPONENT) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+def bucket_bounds(bucket):
+    """(lowest, highest) value that falls into a bucket"""
+    if bucket < EXACT_LIMIT:
+        return bucket, bucket
+    exponent = _FIRST_EXPONENT + (bucket - EXACT_LIMIT) // SUB_BUCKETS
+    mantissa = SUB_BUCKETS + (bucket - EXACT_LIMIT) % SUB_BUCKETS
+    shift = exponent - _SUB_BITS
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+def bucket_array(values):
+    """Vectorized bucket_of() over a NumPy array of whole numbers"""
+    import numpy as np
+
+    values = np.maximum(values.astype(np.int64), 0)
+    exponent = np.floor(np.log2(np.maximum(values, 1))).astype(np.int64)
+    shift = np.maximum(exponent - _SUB_BITS, 0)
+    large = EXACT_LIMIT + (exponent - _FIRST_EXPONENT) * SUB_BUCKETS + (values >> shift) - SUB_BUCKETS
+    return np.where(values < EXACT_LIMIT, values, large)
+
+class LogHistogram:
+    """Mergeable bucket counts with approximate quantiles"""
+    __slots__ = ('counts',)
+
+    def __init__(self, counts=None):
+        self.counts = dict(counts or {})
+
+    def add(self, value, count=1):
+        bucket = bucket_of(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        return self
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def quantile(self, q):
+        """Midpoint of the bucket holding the q-th quantile, or None if empty"""
+        total = self.total
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                low, high = bucket_bounds(bucket)
+                return (low + high) / 2
+        low, high = bucket_bounds(max(self.counts))
+        return (low + high) / 2
+
+    def mean(self):
+        total = self.total
+        if not total:
+            return None
+        return sum(sum(bucket_bounds(b)) / 2 * c for b, c in self.counts.items()) / total
+
+    def summary(self):
+        summary = {'count': self.total, 'mean': self.mean()}
+        for q in QUANTILES:
+            summary[f'p{int(q * 100)}'] = self.quantile(q)
+        return summary
+
+    def distribution(self):
+        """[{'min', 'max', 'count'}] for the non-empty buckets, in order"""
+        return [dict(zip(('min', 'max'), bucket_bounds(b)), count=self.counts[b]) for b in sorted(self.counts)]
+
+def _upsert(rows):
+    """Add rows' counts to existing buckets, inserting missing ones"""
+    table = AnalyticsBucket.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        insert = None
+
+    if insert is not None:
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.scope, table.c.key, table.c.metric, table.c.bucket],
+            set_={'count': table.c.count + statement.excluded.count})
+        db.session.execute(statement, rows)
+        return
+    for row in rows:
+        updated = db.session.execute(table.update().where(
+            (table.c.scope == row['scope']) & (table.c.key == row['key'])
+            & (table.c.metric == row['metric']) & (table.c.bucket == row['bucket'])
+        ).values(count=table.c.count + row['count']))
+        if not updated.rowcount:
+            db.session.execute(table.insert(), [row])
+
+def record_progress(level, time_taken, attempts):
+    """Count one save in its level and challenge histograms (caller commits).
+
+    Values that are not whole numbers are left out. The upsert runs in a
+    savepoint, so a failure is logged and leaves the caller's transaction,
+    and the save in it, intact.
+    """
+    keys = [('level', level)]
+    entry = catalog.for_level(level)
+    if entry is not None:
+        keys.append(('challenge', entry.id))
+    rows = []
+    for metric, value in (('time_taken', time_taken), ('attempts', attempts)):
+        try:
+            bucket = bucket_of(value)
+        except (TypeError, ValueError, OverflowError):
+            continue
+        rows.extend({'scope': scope, 'key': key, 'metric': metric, 'bucket': bucket, 'count': 1}
+                    for scope, key in keys)
+    if not rows:
+        return
+    try:
+        with db.session.begin_nested():
+            _upsert(rows)
+    except Exception:
+        current_app.logger.exception('Analytics update failed for level %s', level)
+
+def load_histograms(scope, key=None):
+    """{key: {metric: LogHistogram}} for a scope, optionally a single key"""
+    query = db.session.query(
+        AnalyticsBucket.key, AnalyticsBucket.metric, AnalyticsBucket.bucket, AnalyticsBucket.count
+    ).filter(AnalyticsBucket.scope == scope)
+    if key is not None:
+        query = query.filter(AnalyticsBucket.key == key)
+    histograms = {}
+    for row_key, metric, bucket, count in query:
+        per_key = histograms.setdefault(row_key, {m: LogHistogram() for m in METRICS})
+        per_key[metric].counts[bucket] = count
+    return histograms
+
+def backfill(chunk_size=DEFAULT_CHUNK_SIZE):
+    """Rebuild all histograms from game_progress; returns the rows scanned.
+
+    Archived progress is read from its partitions, so histograms keep the
+    rows moved out by archive-data. Saves committed while this runs may be
+    missed, so run it when the app is quiet.
+    """
+    import numpy as np
+
+    from archive import archived_chunks
+
+    # Same level -> challenge mapping as the catalog (first challenge by id)
+    level_challenge = {}
+    for challenge_id, level in db.session.query(Challenge.id, Challenge.level).order_by(Challenge.id):
+        level_challenge.setdefault(level, challenge_id)
+
+    totals = {}
+    scanned = 0
+    result = db.session.execute(
+        db.select(GameProgress.level, GameProgress.time_taken, GameProgress.attempts),
+        execution_options={'stream_results': True, 'yield_per': chunk_size})
+    archived = archived_chunks('game_progress', ('level', 'time_taken', 'attempts'), chunk_size)
+    for partition in itertools.chain(archived, result.partitions()):
+        # NULLs become NaN and are left out of that metric
+        data = np.array(partition, dtype=np.float64)
+        scanned += len(data)
+        levels = data[:, 0].astype(np.int64)
+        for column, metric in ((1, 'time_taken'), (2, 'attempts')):
+            present = ~np.isnan(data[:, column])
+            keyed = np.stack([levels[present], bucket_array(data[present, column])], axis=1)
+            if not len(keyed):
+                continue
+            pairs, counts = np.unique(keyed, axis=0, return_counts=True)
+            for (level, bucket), count in zip(pairs.tolist(), counts.tolist()):
+                index = ('level', level, metric, bucket)
+                totals[index] = totals.get(index, 0) + count
+                challenge_id = level_challenge.get(level)
+                if challenge_id is not None:
+                    index = ('challenge', challenge_id, metric, bucket)
+                    totals[index] = totals.get(index, 0) + count
+
+    db.session.query(AnalyticsBucket).delete()
+    db.session.bulk_insert_mappings(AnalyticsBucket, [
+        {'scope': scope, 'key': key, 'metric': metric, 'bucket': bucket, 'count': count}
+        for (scope, key, metric, bucket), count in totals.items()])
+    db.session.commit()
+    return scanned
+
+def _payload(key_name, key, histograms):
+    payload = {key_name: key}
+    for metric in METRICS:
+        payload[metric] = histograms[metric].summary()
+    payload['attempts']['distribution'] = histograms['attempts'].distribution()
+    return payload
+
+analytics_bp = Blueprint('analytics', __name__, url_prefix='/analytics')
+
+@analytics_bp.before_request
+def _require_login():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+@analytics_bp.route('/levels')
+@read_only
+def levels():
+    histograms = load_histograms('level')
+    overall = {metric: LogHistogram() for metric in METRICS}
+    for per_key in histograms.values():
+        for metric in METRICS:
+            overall[metric].merge(per_key[metric])
+    return jsonify({
+        'levels': [_payload('level', level, histograms[level]) for level in sorted(histograms)],
+        'overall': _payload('level', None, overall)
+    })
+
+@analytics_bp.route('/levels/<int:level>')
+@read_only
+def level_detail(level):
+    histograms = load_histograms('level', level)
+    if level not in histograms:
+        return jsonify({'error': 'No data for this level'}), 404
+    return jsonify(_payload('level', level, histograms[level]))
+
+@analytics_bp.route('/challenges')
+@read_only
+def challenges():
+    histograms = load_histograms('challenge')
+    return jsonify({'challenges': [_payload('challenge_id', challenge_id, histograms[challenge_id])
+                                   for challenge_id in sorted(histograms)]})
+
+def init_app(app):
+    """Register the analytics endpoints"""
+    app.register_blueprint(analytics_bp)
@@ -1,29 +1,143 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
-from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
-from flask_sqlalchemy import SQLAlchemy
-from config import Config
-from models import db, User, Challenge, GameProgress, MultiplayerStats, Achievement, Leaderboard
+from flask import Blueprint, Flask, g, render_template, request, jsonify, session, redirect, url_for, flash
+from flask_socketio import emit, join_room, leave_room, rooms
+from config import config
+from models import db, User, Challenge, GameProgress, MultiplayerStats, MultiplayerMatch, Achievement
 from database import encrypt_data, decrypt_data
+from passwords import hash_password, verify_password
+import db_routing
+import user_context
+from user_context import current_user
+from catalog import catalog
+from index_advisor import index_advisor
+import metrics
+import profiling
+import data_transfer
+import analytics
+import similarity
+import archive
+import recommender
+from metrics import InstrumentedSocketIO
+from pagination import InvalidCursor, paginate, parse_limit
+from serializers import MULTIPLAYER_MATCH, match_query
+from snapshots import conditional_response, leaderboard_snapshots, stats_snapshot
+from render_cache import cached_page
 import json
+import os
 from datetime import datetime
-import hashlib
 import random
+import time
 
-app = Flask(__name__)
-app.config.from_object(Config)
-db.init_app(app)
-socketio = SocketIO(app, cors_allowed_origins="*", manage_session=False)
+# Absolute, so `flask db` and pathfinder-init work from any directory
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
 
-# Initialize database
-with app.app_context():
-    db.create_all()
+main = Blueprint('main', __name__)
+socketio = InstrumentedSocketIO()
+
+# Lesson outlines are static, so they are built once rather than per request
+LESSONS = {
+    'python_basics': {
+        'title': 'Python Fundamentals',
+        'content': [
+            'Variables and Data Types',
+            'Control Structures',
+            'Functions',
+            'Lists and Dictionaries',
+            'File Handling'
+        ]
+    },
+    'web_basics': {
+        'title': 'Web Development',
+        'content': [
+            'HTML Structure',
+            'CSS Styling',
+            'JavaScript Basics',
+            'HTTP Protocol',
+            'Flask Framework'
+        ]
+    },
+    'advanced_python': {
+        'title': 'Advanced Python',
+        'content': [
+            'Object-Oriented Programming',
+            'Decorators and Generators',
+            'Context Managers',
+            'Async Programming',
+            'Testing and Debugging'
+        ]
+    },
+    'database': {
+        'title': 'Database Fundamentals',
+        'content': [
+            'SQL Basics',
+            'Database Design',
+            'ORM with SQLAlchemy',
+            'Migrations',
+            'Performance Optimization'
+        ]
+    }
+}
+
+LESSON_NOT_FOUND = {
+    'title': 'Topic Not Found',
+    'content': ['This lesson is under construction!']
+}
+
+def create_app(config_name=None):
+    """Build and configure a Flask application instance"""
+    app = Flask(__name__)
+    if config_name is None or isinstance(config_name, str):
+        app.config.from_object(config[config_name or 'default'])
+    else:
+        app.config.from_object(config_name)
+    
+    # Extensions are bound lazily; schema creation and seeding live in the
+    # init-db command so that booting a worker never touches the database.
+    db_routing.init_app(app)
+    db.init_app(app)
+    db_routing.install_listeners(app, db)
+    socketio.init_app(app, cors_allowed_origins="*", manage_session=False)
+    catalog.init_app(app)
+    index_advisor.init_app(app)
+    metrics.init_app(app)
+    profiling.init_app(app)
+    leaderboard_snapshots.init_app(app, socketio)
+    data_transfer.init_app(app)
+    analytics.init_app(app)
+    similarity.init_app(app)
+    archive.init_app(app)
+    recommender.init_app(app)
+    
+    # Imported here: alembic is only needed for `flask db`, not at import time
+    from flask_migrate import Migrate
+    Migrate(app, db, directory=MIGRATIONS_DIR, render_as_batch=True)
+    
+    app.register_blueprint(main)
+    
+    from scripts.init_db import init_db_command
+    from scripts.load_challenges import load_challenges_command
+    from scripts.export_data import export_data_command
+    from scripts.import_data import import_data_command
+    from scripts.backfill_analytics import backfill_analytics_command
+    from scripts.index_submissions import index_submissions_command
+    from scripts.archive_data import archive_data_command
+    from scripts.backfill_skills import backfill_skills_command
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(load_challenges_command)
+    app.cli.add_command(export_data_command)
+    app.cli.add_command(import_data_command)
+    app.cli.add_command(backfill_analytics_command)
+    app.cli.add_command(index_submissions_command)
+    app.cli.add_command(archive_data_command)
+    app.cli.add_command(backfill_skills_command)
+    
+    return app
 
 # Routes
-@app.route('/')
+@main.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/register', methods=['GET', 'POST'])
+@main.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -34,16 +148,18 @@ def register():
         # Validate input
         if not username or not email or not password:
             flash('All fields are required', 'error')
-            return redirect(url_for('register'))
+            return redirect(url_for('.register'))
         
-        # Check if user exists
-        existing_user = User.query.filter((User.username == username) | (User.email == email)).first()
+        # Check if user exists (case-insensitive, via the lowered lookup columns)
+        existing_user = User.query.filter(
+            (User.username_lower == username.lower()) | (User.email_lower == email.lower())
+        ).first()
         if existing_user:
             flash('Username or email already exists', 'error')
-            return redirect(url_for('register'))
+            return redirect(url_for('.register'))
         
-        # Create user
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
+        # Create user; the KDF runs in a worker thread, not on the event loop
+        password_hash = hash_password(password)
         user = User(
             username=username,
             email=email,
@@ -66,15 +182,15 @@ def register():
             session['theme'] = user.theme_preference
             
             flash('Registration successful! Welcome to Python Pathfinder!', 'success')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('.dashboard'))
         except Exception as e:
             db.session.rollback()
             flash('Registration failed. Please try again.', 'error')
-            return redirect(url_for('register'))
+            return redirect(url_for('.register'))
     
     return render_template('register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -82,15 +198,19 @@ def login():
         
         if not username or not password:
             flash('Please enter username and password', 'error')
-            return redirect(url_for('login'))
+            return redirect(url_for('.login'))
         
         # Find user by username or email
-        user = User.query.filter((User.username == username) | (User.email == username)).first()
+        user = User.find_by_login(username)
         
         if user:
-            # Verify password
-            password_hash = hashlib.sha256(password.encode()).hexdigest()
-            if user.password_hash == password_hash:
+            # Verify password off the event loop
+            valid, rehash = verify_password(user.password_hash, password)
+            if valid:
+                # Upgrade legacy SHA-256 (or outdated KDF) hashes on login
+                if rehash:
+                    user.password_hash = hash_password(password)
+                
                 # Update last login
                 user.last_login = datetime.utcnow()
                 db.session.commit()
@@ -101,59 +221,53 @@ def login():
                 session['theme'] = user.theme_preference
                 
                 flash('Login successful!', 'success')
-                return redirect(url_for('dashboard'))
+                return redirect(url_for('.dashboard'))
         
         flash('Invalid username or password', 'error')
     
     return render_template('login.html')
 
-@app.route('/logout')
+@main.route('/logout')
 def logout():
     session.clear()
     flash('Logged out successfully', 'info')
-    return redirect(url_for('index'))
+    return redirect(url_for('.index'))
 
-@app.route('/dashboard')
+@main.route('/dashboard')
 def dashboard():
     if 'user_id' not in session:
         flash('Please login first', 'warning')
-        return redirect(url_for('login'))
-    
-    # Get user stats
-    user_id = session['user_id']
-    user = User.query.get(user_id)
-    
-    # Calculate stats
-    total_score = db.session.query(db.func.sum(GameProgress.score)).filter(
-        GameProgress.user_id == user_id
-    ).scalar() or 0
+        return redirect(url_for('.login'))
     
-    levels_completed = db.session.query(db.func.count(GameProgress.level)).filter(
-        GameProgress.user_id == user_id
-    ).scalar() or 0
-    
-    highest_level = db.session.query(db.func.max(GameProgress.level)).filter(
-        GameProgress.user_id == user_id
-    ).scalar() or 1
+    # User record and stats come from the user context cache
+    user = current_user()
+    if user is None:
+        session.clear()
+        return redirect(url_for('.login'))
     
+    all_stats = user_context.user_stats(user)
     stats = {
-        'total_score': total_score,
-        'levels_completed': levels_completed,
-        'highest_level': highest_level
+        'total_score': all_stats['total_score'],
+        'levels_completed': all_stats['levels_completed'],
+        'highest_level': all_stats['highest_level']
     }
     
     return render_template('dashboard.html', 
-                         username=session['username'],
-                         theme=session.get('theme', 'cute'),
+                         username=user.username,
+                         theme=user.theme,
                          stats=stats)
 
-@app.route('/game/<int:level>')
+@main.route('/game/<int:level>')
 def game(level):
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     
-    # Get challenge for this level
-    challenge = Challenge.query.filter_by(level=level).first()
+    theme = session.get('theme', 'cute')
+    version = catalog.version
+    
+    # Get challenge for this level from the in-memory catalog
+    entry = catalog.for_level(level)
+    challenge = entry.payload if entry else None
     if not challenge:
         # Create a default challenge if none exists
         challenge = {
@@ -163,81 +277,32 @@ def game(level):
             'difficulty': 'beginner'
         }
     
-    return render_template('game.html', 
-                         level=level, 
-                         challenge=challenge,
-                         theme=session.get('theme', 'cute'))
+    return cached_page(('game.html', level, theme, version), lambda: render_template(
+        'game.html', level=level, challenge=challenge, theme=theme))
 
-@app.route('/multiplayer')
+@main.route('/multiplayer')
 def multiplayer():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     
     # Get available challenges for multiplayer
-    challenges = Challenge.query.filter_by(is_active=True).limit(5).all()
+    challenges = [entry.payload for entry in catalog.active(limit=5)]
     return render_template('multiplayer.html', 
                          theme=session.get('theme', 'cute'),
                          challenges=challenges)
 
-@app.route('/lessons/<topic>')
+@main.route('/lessons/<topic>')
 def lessons(topic):
     if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    lessons_data = {
-        'python_basics': {
-            'title': 'Python Fundamentals',
-            'content': [
-                'Variables and Data Types',
-                'Control Structures',
-                'Functions',
-                'Lists and Dictionaries',
-                'File Handling'
-            ]
-        },
-        'web_basics': {
-            'title': 'Web Development',
-            'content': [
-                'HTML Structure',
-                'CSS Styling',
-                'JavaScript Basics',
-                'HTTP Protocol',
-                'Flask Framework'
-            ]
-        },
-        'advanced_python': {
-            'title': 'Advanced Python',
-            'content': [
-                'Object-Oriented Programming',
-                'Decorators and Generators',
-                'Context Managers',
-                'Async Programming',
-                'Testing and Debugging'
-            ]
-        },
-        'database': {
-            'title': 'Database Fundamentals',
-            'content': [
-                'SQL Basics',
-                'Database Design',
-                'ORM with SQLAlchemy',
-                'Migrations',
-                'Performance Optimization'
-            ]
-        }
-    }
+        return redirect(url_for('.login'))
     
-    lesson = lessons_data.get(topic, {
-        'title': 'Topic Not Found',
-        'content': ['This lesson is under construction!']
-    })
+    theme = session.get('theme', 'cute')
+    lesson = LESSONS.get(topic, LESSON_NOT_FOUND)
     
-    return render_template('lessons.html', 
-                         topic=topic, 
-                         lesson=lesson,
-                         theme=session.get('theme', 'cute'))
+    return cached_page(('lessons.html', topic, theme), lambda: render_template(
+        'lessons.html', topic=topic, lesson=lesson, theme=theme))
 
-@app.route('/save_progress', methods=['POST'])
+@main.route('/save_progress', methods=['POST'])
 def save_user_progress():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
@@ -246,6 +311,14 @@ def save_user_progress():
         data = request.json
         user_id = session['user_id']
         
+        # Whole numbers only; anything else would fail the save or the analytics
+        try:
+            time_taken = data.get('time_taken')
+            time_taken = int(time_taken) if time_taken is not None else None
+            attempts = int(data.get('attempts', 1))
+        except (TypeError, ValueError, OverflowError):
+            return jsonify({'error': 'time_taken and attempts must be integers'}), 400
+        
         # Encrypt code solution
         encrypted_solution = encrypt_data({
             'code': data.get('code_solution', ''),
@@ -258,13 +331,18 @@ def save_user_progress():
             level=data.get('level', 1),
             score=data.get('score', 0),
             code_solution=encrypted_solution,
-            time_taken=data.get('time_taken'),
-            attempts=data.get('attempts', 1)
+            time_taken=time_taken,
+            attempts=attempts
         )
         
         db.session.add(progress)
+        analytics.record_progress(progress.level, progress.time_taken, progress.attempts)
+        recommender.record_result(user_id, progress.level, progress.score, progress.time_taken, progress.attempts)
         db.session.commit()
         
+        # Cached stats are now stale
+        user_context.invalidate(user_id)
+        
         # Check for achievements
         check_achievements(user_id)
         
@@ -273,54 +351,74 @@ def save_user_progress():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/leaderboard')
+@main.route('/leaderboard')
+@db_routing.read_only
 def get_leaderboard():
-    # Get top players
-    top_players = Leaderboard.query.order_by(
-        Leaderboard.total_score.desc()
-    ).limit(20).all()
-    
-    leaderboard_data = []
-    for player in top_players:
-        leaderboard_data.append({
-            'username': player.user.username,
-            'total_score': player.total_score,
-            'levels_completed': player.levels_completed,
-            'multiplayer_rating': player.multiplayer_rating
-        })
+    # Served from a shared snapshot; paging is keyset-based via ?cursor=
+    try:
+        snapshot = leaderboard_snapshots.get(request.args.get('cursor'),
+                                             parse_limit(request.args.get('limit')))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify(leaderboard_data)
+    return conditional_response(snapshot)
 
-@app.route('/user_stats')
-def get_user_stats():
+@main.route('/matches')
+@db_routing.read_only
+def get_matches():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
-    user_id = session['user_id']
+    # Only admins may page through another user's matches
+    user_id = request.args.get('user_id', session['user_id'], type=int)
+    if user_id != session['user_id'] and not profiling.is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    # One query for the page: usernames are joined in, not lazily loaded
+    query = match_query(MultiplayerMatch.id) \
+        .filter((MultiplayerMatch.player1_id == user_id) | (MultiplayerMatch.player2_id == user_id))
     
-    # Get basic stats
-    total_score = db.session.query(db.func.sum(GameProgress.score)).filter(
-        GameProgress.user_id == user_id
-    ).scalar() or 0
+    status = request.args.get('status')
+    if status:
+        query = query.filter(MultiplayerMatch.status == status)
     
-    levels_completed = db.session.query(db.func.count(GameProgress.level)).filter(
-        GameProgress.user_id == user_id
-    ).scalar() or 0
+    try:
+        rows, next_cursor = paginate(
+            query,
+            [MultiplayerMatch.id],
+            request.args.get('cursor'),
+            parse_limit(request.args.get('limit'))
+        )
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Get multiplayer stats
-    multiplayer_stats = MultiplayerStats.query.filter_by(user_id=user_id).first()
+    matches = MULTIPLAYER_MATCH.encode_all(rows)
     
-    stats = {
-        'total_score': total_score,
-        'levels_completed': levels_completed,
-        'multiplayer_wins': multiplayer_stats.wins if multiplayer_stats else 0,
-        'multiplayer_losses': multiplayer_stats.losses if multiplayer_stats else 0,
-        'multiplayer_rating': multiplayer_stats.rating if multiplayer_stats else 1000
-    }
+    return jsonify({'matches': matches, 'next_cursor': next_cursor})
+
+@main.route('/user_stats')
+@db_routing.read_only
+def get_user_stats():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    user = current_user()
+    if user is None:
+        return jsonify({'error': 'Not authenticated'}), 401
     
-    return jsonify(stats)
+    def build():
+        all_stats = user_context.user_stats(user)
+        return {
+            'total_score': all_stats['total_score'],
+            'levels_completed': all_stats['levels_completed'],
+            'multiplayer_wins': all_stats['multiplayer_wins'],
+            'multiplayer_losses': all_stats['multiplayer_losses'],
+            'multiplayer_rating': all_stats['multiplayer_rating']
+        }
+    
+    return conditional_response(stats_snapshot(user, build))
 
-@app.route('/update_theme', methods=['POST'])
+@main.route('/update_theme', methods=['POST'])
 def update_theme():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
@@ -332,10 +430,11 @@ def update_theme():
         if new_theme not in ['cute', 'deadly']:
             return jsonify({'error': 'Invalid theme'}), 400
         
-        # Update user preference
-        user = User.query.get(session['user_id'])
-        user.theme_preference = new_theme
+        # Update user preference without loading the row
+        user_id = session['user_id']
+        User.query.filter_by(id=user_id).update({'theme_preference': new_theme})
         db.session.commit()
+        user_context.invalidate(user_id)
         
         # Update session
         session['theme'] = new_theme
@@ -359,6 +458,7 @@ def handle_connect():
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    user_context.release_connection()
     if 'user_id' in session:
         user_id = session['user_id']
         username = session['username']
@@ -392,6 +492,10 @@ def handle_leave_room(data):
             'message': f'{username} has left the room'
         }, room=room)
 
+@socketio.on('subscribe_leaderboard')
+def handle_subscribe_leaderboard(data=None):
+    leaderboard_snapshots.subscribe()
+
 @socketio.on('create_room')
 def handle_create_room(data):
     room_id = f"room_{random.randint(1000, 9999)}"
@@ -412,7 +516,10 @@ def handle_challenge_submit(data):
     challenge_id = data.get('challenge_id')
     
     # Evaluate code (simplified)
+    started = time.perf_counter()
+    metrics.sandbox_queue_wait.observe(started - g.get('_event_received_at', started))
     result = evaluate_code(code, challenge_id)
+    metrics.sandbox_execution.observe(time.perf_counter() - started)
     
     emit('challenge_result', {
         'username': username,
@@ -509,14 +616,15 @@ def award_achievement(user_id, criteria):
         print(f"Error awarding achievement: {e}")
 
 # Error handlers
-@app.errorhandler(404)
+@main.app_errorhandler(404)
 def not_found_error(error):
     return render_template('404.html', theme=session.get('theme', 'cute')), 404
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return render_template('500.html', theme=session.get('theme', 'cute')), 500
 
 if __name__ == '__main__':
+    app = create_app()
     socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
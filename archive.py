@@ -0,0 +1,293 @@
+"""Retention policy and monthly archive partitions for history tables.
+
+Rows of code_submissions older than SUBMISSION_RETENTION_DAYS, and of
+game_progress older than PROGRESS_RETENTION_DAYS, are moved out of the
+primary database into append-only, gzip-compressed NDJSON partitions, one
+per table and month:
+
+    <ARCHIVE_DIR>/code_submissions/2024-03.ndjson.gz
+
+Each run appends one gzip member per user and chunk, so existing bytes are
+never rewritten, and archive_segments records the byte range of every
+member. For every user and partition, archive_summaries keeps the row
+count, score total, highest level and time range online. User stats
+therefore include archived progress without opening any file.
+
+history() reads hot rows first and then falls back to the user's archived
+rows, newest partition first, so callers see one continuous history. It
+seeks to the user's own segments and decompresses only those, not the whole
+month. Backfills that rebuild derived tables replay iter_table() before the
+hot rows.
+
+A run deletes each chunk only after it has been appended and its summaries
+and segments recorded, all in one transaction. If a run dies between the
+file write and the commit, those rows are appended again next time; the
+orphaned bytes have no segment, so readers that go through the segments
+never see them. Partitions written before segments were recorded are
+scanned whole, and the duplicate ids are dropped. Archived submissions
+also leave the similarity index.
+
+    flask --app "app:create_app()" archive-data --vacuum
+"""
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, jsonify, request, session
+
+from db_routing import read_only
+from models import db, ArchiveSegment, ArchiveSummary, CodeSubmission, GameProgress, SubmissionFingerprint, SubmissionLSHBucket
+from pagination import parse_limit
+from serializers import CODE_SUBMISSION, GAME_PROGRESS
+
+DEFAULT_CHUNK_SIZE = 1000
+
+class Policy:
+    __slots__ = ('model', 'timestamp', 'setting', 'encoder')
+
+    def __init__(self, model, timestamp, setting, encoder):
+        self.model = model
+        self.timestamp = timestamp
+        self.setting = setting
+        self.encoder = encoder
+
+POLICIES = {
+    'code_submissions': Policy(CodeSubmission, CodeSubmission.submitted_at, 'SUBMISSION_RETENTION_DAYS',
+                               CODE_SUBMISSION),
+    'game_progress': Policy(GameProgress, GameProgress.completed_at, 'PROGRESS_RETENTION_DAYS', GAME_PROGRESS),
+}
+
+class ArchiveReport:
+    def __init__(self, table_name, cutoff):
+        self.table_name = table_name
+        self.cutoff = cutoff
+        self.archived = 0
+        self.partitions = set()
+
+    def to_dict(self):
+        return {
+            'table': self.table_name,
+            'cutoff': self.cutoff.isoformat() if self.cutoff else None,
+            'archived': self.archived,
+            'partitions': sorted(self.partitions)
+        }
+
+def archive_dir():
+    return current_app.config.get('ARCHIVE_DIR') or os.path.join(current_app.instance_path, 'archive')
+
+def partition_path(table_name, partition):
+    return os.path.join(archive_dir(), table_name, f'{partition}.ndjson.gz')
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def _append(table_name, partition, rows):
+    """Append rows as one gzip member per user; returns the segment mappings"""
+    path = partition_path(table_name, partition)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    by_user = {}
+    for row in rows:
+        by_user.setdefault(row['user_id'], []).append(row)
+    segments = []
+    with open(path, 'ab') as fh:
+        offset = fh.seek(0, os.SEEK_END)
+        for user_id, user_rows in by_user.items():
+            data = gzip.compress(''.join(
+                json.dumps({key: _jsonable(value) for key, value in row.items()}, separators=(',', ':')) + '\n'
+                for row in user_rows).encode('utf-8'))
+            fh.write(data)
+            segments.append({'table_name': table_name, 'partition': partition, 'user_id': user_id,
+                             'byte_offset': offset, 'byte_length': len(data), 'rows': len(user_rows)})
+            offset += len(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    return segments
+
+def _add_summaries(table_name, partition, rows, timestamp_key):
+    totals = {}
+    for row in rows:
+        summary = totals.setdefault(row['user_id'], {'rows': 0, 'score': 0, 'level': None,
+                                                     'first': row[timestamp_key], 'last': row[timestamp_key]})
+        summary['rows'] += 1
+        summary['score'] += row.get('score') or 0
+        if row.get('level') is not None:
+            summary['level'] = max(summary['level'] or 0, row['level'])
+        summary['first'] = min(summary['first'], row[timestamp_key])
+        summary['last'] = max(summary['last'], row[timestamp_key])
+
+    existing = {summary.user_id: summary for summary in ArchiveSummary.query.filter(
+        ArchiveSummary.table_name == table_name, ArchiveSummary.partition == partition,
+        ArchiveSummary.user_id.in_(list(totals)))}
+    for user_id, total in totals.items():
+        summary = existing.get(user_id)
+        if summary is None:
+            summary = ArchiveSummary(table_name=table_name, partition=partition, user_id=user_id,
+                                     rows=0, score_total=0, first_at=total['first'], last_at=total['last'])
+            db.session.add(summary)
+        summary.rows += total['rows']
+        summary.score_total += total['score']
+        if total['level'] is not None:
+            summary.max_level = max(summary.max_level or 0, total['level'])
+        summary.first_at = min(summary.first_at, total['first'])
+        summary.last_at = max(summary.last_at, total['last'])
+
+def archive_table(table_name, days=None, chunk_size=DEFAULT_CHUNK_SIZE, now=None):
+    """Move rows older than the retention period into monthly partitions"""
+    policy = POLICIES[table_name]
+    days = current_app.config.get(policy.setting) if days is None else days
+    if not days:
+        return ArchiveReport(table_name, None)
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    report = ArchiveReport(table_name, cutoff)
+    table = policy.model.__table__
+    timestamp_key = policy.timestamp.key
+
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(table).where(policy.timestamp < cutoff, table.c.id > last_id)
+            .order_by(table.c.id).limit(chunk_size)).mappings().all()
+        if not rows:
+            return report
+        by_partition = {}
+        for row in rows:
+            by_partition.setdefault(row[timestamp_key].strftime('%Y-%m'), []).append(row)
+        for partition, partition_rows in sorted(by_partition.items()):
+            db.session.bulk_insert_mappings(ArchiveSegment, _append(table_name, partition, partition_rows))
+            _add_summaries(table_name, partition, partition_rows, timestamp_key)
+            report.partitions.add(partition)
+
+        ids = [row['id'] for row in rows]
+        if policy.model is CodeSubmission:
+            db.session.execute(SubmissionLSHBucket.__table__.delete().where(
+                SubmissionLSHBucket.submission_id.in_(ids)))
+            db.session.execute(SubmissionFingerprint.__table__.delete().where(
+                SubmissionFingerprint.submission_id.in_(ids)))
+        db.session.execute(table.delete().where(table.c.id.in_(ids)))
+        db.session.commit()
+        report.archived += len(ids)
+        last_id = ids[-1]
+
+def vacuum():
+    """Return freed pages to the filesystem (SQLite only)"""
+    engine = db.engine
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as conn:
+            conn.exec_driver_sql('VACUUM')
+
+def read_partition(table_name, partition):
+    """Yield the archived rows of one partition as dicts"""
+    path = partition_path(table_name, partition)
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, 'rt', encoding='utf-8') as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+def read_segments(table_name, partition, segments):
+    """Yield the archived rows stored in (byte_offset, byte_length) segments"""
+    with open(partition_path(table_name, partition), 'rb') as fh:
+        for offset, length in segments:
+            fh.seek(offset)
+            for line in gzip.decompress(fh.read(length)).decode('utf-8').splitlines():
+                if line.strip():
+                    yield json.loads(line)
+
+def iter_table(table_name):
+    """Yield every archived row of a table, oldest partition first.
+
+    Rows come in the order they were archived, so each user's rows are in
+    id order. Only one gzip member is decompressed at a time.
+    """
+    totals = dict(db.session.query(ArchiveSummary.partition, db.func.sum(ArchiveSummary.rows)).filter(
+        ArchiveSummary.table_name == table_name).group_by(ArchiveSummary.partition))
+    covered = dict(db.session.query(ArchiveSegment.partition, db.func.sum(ArchiveSegment.rows)).filter(
+        ArchiveSegment.table_name == table_name).group_by(ArchiveSegment.partition))
+    for partition in sorted(totals):
+        if covered.get(partition, 0) >= totals[partition]:
+            # Orphaned bytes from an interrupted run have no segment, so
+            # reading the segments alone never sees a duplicate
+            segments = db.session.query(ArchiveSegment.byte_offset, ArchiveSegment.byte_length).filter(
+                ArchiveSegment.table_name == table_name, ArchiveSegment.partition == partition
+            ).order_by(ArchiveSegment.byte_offset).all()
+            yield from read_segments(table_name, partition, segments)
+        else:
+            # Archived before segments were recorded: scan the file, keeping
+            # the first copy of each id
+            seen = set()
+            for row in read_partition(table_name, partition):
+                if row['id'] not in seen:
+                    seen.add(row['id'])
+                    yield row
+
+def archived_chunks(table_name, columns, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of column tuples for every archived row, as iter_table orders them"""
+    chunk = []
+    for row in iter_table(table_name):
+        chunk.append(tuple(row.get(column) for column in columns))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def iter_archived(table_name, user_id):
+    """Yield a user's archived rows, newest first, without duplicates"""
+    segments = {}
+    for partition, offset, length, rows in db.session.query(
+            ArchiveSegment.partition, ArchiveSegment.byte_offset, ArchiveSegment.byte_length, ArchiveSegment.rows
+    ).filter(ArchiveSegment.table_name == table_name, ArchiveSegment.user_id == user_id).order_by(ArchiveSegment.id):
+        ranges, covered = segments.get(partition, ([], 0))
+        ranges.append((offset, length))
+        segments[partition] = (ranges, covered + rows)
+    summaries = db.session.query(ArchiveSummary.partition, ArchiveSummary.rows).filter(
+        ArchiveSummary.table_name == table_name, ArchiveSummary.user_id == user_id
+    ).order_by(ArchiveSummary.partition.desc())
+    for partition, total in summaries.all():
+        ranges, covered = segments.get(partition, ([], 0))
+        if covered >= total:
+            found = read_segments(table_name, partition, ranges)
+        else:
+            # Archived before segments were recorded: scan the whole partition
+            found = (row for row in read_partition(table_name, partition) if row['user_id'] == user_id)
+        rows = {row['id']: row for row in found}
+        for row_id in sorted(rows, reverse=True):
+            yield rows[row_id]
+
+def history(table_name, user_id, limit):
+    """Up to limit of a user's rows, newest first, reading through to the archive"""
+    policy = POLICIES[table_name]
+    id_column = policy.model.__table__.c.id
+    hot = policy.encoder.query().filter(policy.model.user_id == user_id) \
+        .order_by(id_column.desc()).limit(limit).all()
+    entries = [dict(policy.encoder.encode(row), archived=False) for row in hot]
+    if len(entries) < limit:
+        keys = policy.encoder.keys
+        for row in iter_archived(table_name, user_id):
+            entries.append(dict({key: row.get(key) for key in keys}, archived=True))
+            if len(entries) >= limit:
+                break
+    return entries
+
+history_bp = Blueprint('history', __name__, url_prefix='/history')
+
+@history_bp.before_request
+def _require_login():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+@history_bp.route('/progress')
+@read_only
+def progress_history():
+    return jsonify(history('game_progress', session['user_id'], parse_limit(request.args.get('limit'))))
+
+@history_bp.route('/submissions')
+@read_only
+def submission_history():
+    return jsonify(history('code_submissions', session['user_id'], parse_limit(request.args.get('limit'))))
+
+def init_app(app):
+    """Register the history endpoints"""
+    app.register_blueprint(history_bp)
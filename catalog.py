@@ -0,0 +1,182 @@
+"""In-process challenge catalog.
+
+The challenge table is small and read-mostly, so every worker keeps the
+whole catalog in memory: serialized to_dict() payloads plus parsed hints
+and test cases, indexed by id, level and category.
+
+Consistency across worker processes is kept with a catalog version token
+stored in a shared file. Any commit that touches a Challenge row (and the
+bulk pack loader) writes a new token; readers compare their cached token
+with the file at most every CATALOG_VERSION_CHECK_INTERVAL seconds and
+rebuild when it changed. Steady-state reads never query the database.
+"""
+import os
+import threading
+import time
+import uuid
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import Challenge
+
+def compile_test_case(case, category='python'):
+    """Return a code object for a test case input, or None if it has no code"""
+    source = case.get('input') or ''
+    if category != 'python' or not source.strip():
+        return None
+    mode = 'eval' if case.get('type') == 'function_call' else 'exec'
+    return compile(source, '<test_case>', mode)
+
+class CatalogEntry:
+    """Pre-serialized view of one challenge"""
+    __slots__ = ('id', 'level', 'category', 'is_active', 'payload', 'hints', 'test_cases', '_compiled_tests')
+
+    def __init__(self, challenge):
+        self.id = challenge.id
+        self.level = challenge.level
+        self.category = challenge.category
+        self.is_active = challenge.is_active
+        self.payload = challenge.to_dict()
+        self.hints = challenge.get_hints()
+        self.test_cases = challenge.get_test_cases()
+        self._compiled_tests = None
+
+    @property
+    def compiled_tests(self):
+        """Code object per test case (None where it has no code), compiled once per catalog version"""
+        if self._compiled_tests is None:
+            compiled = []
+            for case in self.test_cases:
+                try:
+                    compiled.append(compile_test_case(case, self.category))
+                except (SyntaxError, TypeError, ValueError):
+                    # Rows written before packs were validated
+                    compiled.append(None)
+            self._compiled_tests = compiled
+        return self._compiled_tests
+
+class ChallengeCatalog:
+    """Process-wide challenge cache invalidated by a shared version token"""
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._by_id = {}
+        self._by_level = {}
+        self._by_category = {}
+        self._active = []
+        self._highest_level = 0
+        self.version_file = None
+        self.check_interval = 1.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.version_file = app.config.get('CATALOG_VERSION_FILE') or os.path.join(
+            app.instance_path, 'catalog_version')
+        self.check_interval = app.config.get('CATALOG_VERSION_CHECK_INTERVAL', 1.0)
+        app.extensions['challenge_catalog'] = self
+
+    @property
+    def version(self):
+        """Version token the cached entries were built from"""
+        self._ensure_fresh()
+        return self._version
+
+    def _read_shared_version(self):
+        try:
+            with open(self.version_file, 'r') as fh:
+                return fh.read().strip() or 'initial'
+        except FileNotFoundError:
+            return 'initial'
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.check_interval:
+            return
+        shared = self._read_shared_version()
+        self._checked_at = now
+        if shared != self._version:
+            self._rebuild(shared)
+
+    def _rebuild(self, version):
+        with self._lock:
+            if version == self._version:
+                return
+            by_id, by_level, by_category, active = {}, {}, {}, []
+            for challenge in Challenge.query.order_by(Challenge.id).all():
+                entry = CatalogEntry(challenge)
+                by_id[entry.id] = entry
+                # Matches the old filter_by(level=...).first() ordering
+                by_level.setdefault(entry.level, entry)
+                by_category.setdefault(entry.category, []).append(entry)
+                if entry.is_active:
+                    active.append(entry)
+            self._by_id, self._by_level = by_id, by_level
+            self._by_category, self._active = by_category, active
+            self._highest_level = max(by_level, default=0)
+            self._version = version
+
+    def clear(self):
+        """Drop the cached entries; the next read reloads them"""
+        with self._lock:
+            self._version = None
+            self._checked_at = 0.0
+
+    def bump(self):
+        """Publish a new catalog version to every worker"""
+        token = uuid.uuid4().hex
+        directory = os.path.dirname(self.version_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.version_file}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as fh:
+            fh.write(token)
+        os.replace(tmp_path, self.version_file)
+        # Force this process to reload on its next read
+        self._version = None
+        return token
+
+    def get(self, challenge_id):
+        self._ensure_fresh()
+        return self._by_id.get(challenge_id)
+
+    def for_level(self, level):
+        self._ensure_fresh()
+        return self._by_level.get(level)
+
+    def highest_level(self):
+        self._ensure_fresh()
+        return self._highest_level
+
+    def for_category(self, category):
+        self._ensure_fresh()
+        return list(self._by_category.get(category, ()))
+
+    def active(self, limit=None):
+        self._ensure_fresh()
+        return self._active[:limit] if limit is not None else list(self._active)
+
+catalog = ChallengeCatalog()
+
+# Bump the catalog version whenever a committed transaction touched a Challenge
+
+_DIRTY_KEY = 'challenge_catalog_dirty'
+
+@event.listens_for(Session, 'after_flush')
+def _track_challenge_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Challenge):
+            session.info[_DIRTY_KEY] = True
+            return
+
+@event.listens_for(Session, 'after_commit')
+def _bump_on_commit(session):
+    if session.info.pop(_DIRTY_KEY, False) and catalog.version_file:
+        catalog.bump()
+
+@event.listens_for(Session, 'after_rollback')
+def _clear_on_rollback(session):
+    session.info.pop(_DIRTY_KEY, None)
@@ -0,0 +1,320 @@
+"""Bulk loader for challenge packs.
+
+A pack is either a JSON Lines file (one challenge per line), a JSON file
+holding a list of challenges, or a directory of such files. Records flow
+through a generator pipeline so only one chunk is held in memory:
+
+    read -> validate/precompile -> chunk -> bulk upsert by (level, title)
+
+JSON files are parsed one record at a time as well. Test case inputs are
+compiled during validation, and the catalog keeps the compiled code per
+entry (CatalogEntry.compiled_tests), so it is compiled once per version.
+
+Every record is fingerprinted with a content hash. Rows whose hash has not
+changed are skipped, so reloading an unchanged pack issues one SELECT per
+chunk and no writes.
+"""
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import tuple_
+
+from catalog import catalog, compile_test_case
+from models import db, Challenge
+
+CATEGORIES = ('python', 'html', 'css', 'javascript', 'flask')
+DIFFICULTIES = ('beginner', 'intermediate', 'advanced')
+PACK_EXTENSIONS = ('.jsonl', '.json')
+DEFAULT_CHUNK_SIZE = 500
+
+REQUIRED_FIELDS = ('level', 'title', 'description', 'category')
+TEXT_FIELDS = ('starter_code', 'solution_code', 'learning_objectives')
+
+class ChallengePackError(ValueError):
+    """Raised for a pack record that cannot be loaded"""
+
+    def __init__(self, message, source=None):
+        self.source = source
+        super().__init__(f'{source}: {message}' if source else message)
+
+class LoadReport:
+    """Counters for a single pack load"""
+
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def processed(self):
+        return self.inserted + self.updated + self.unchanged
+
+    @property
+    def rows_per_sec(self):
+        if not self.elapsed:
+            return 0.0
+        return self.processed / self.elapsed
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def to_dict(self):
+        return {
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'invalid': len(self.errors),
+            'elapsed': round(self.elapsed, 3),
+            'rows_per_sec': round(self.rows_per_sec, 1)
+        }
+
+def iter_pack_files(path):
+    """Yield pack files under path in a stable order"""
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith(PACK_EXTENSIONS):
+                yield os.path.join(path, name)
+    else:
+        yield path
+
+class _JSONStream:
+    """Reads one JSON value at a time from a text file, for streaming arrays"""
+
+    def __init__(self, fh, source, block_size=65536):
+        self.fh = fh
+        self.source = source
+        self.block_size = block_size
+        self.buffer = ''
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        data = self.fh.read(self.block_size)
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return bool(data)
+
+    def peek(self):
+        """The next non-whitespace character, or '' at end of file"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ChallengePackError(f'invalid JSON: expected {char!r}, found {found or "end of file"!r}',
+                                     self.source)
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except ValueError as e:
+                if self._fill():
+                    continue
+                raise ChallengePackError(f'invalid JSON: {e}', self.source)
+            # A number at the end of the buffer may continue in the next block
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+def _iter_json_array(stream):
+    stream.expect('[')
+    if stream.peek() == ']':
+        stream.expect(']')
+        return
+    index = 0
+    while True:
+        yield f'{stream.source}[{index}]', stream.value()
+        index += 1
+        if stream.peek() != ',':
+            break
+        stream.expect(',')
+    stream.expect(']')
+
+def iter_json_records(fh, filename):
+    """Yield (source, record) pairs from a JSON list, or an object with a
+    "challenges" list, one record at a time"""
+    stream = _JSONStream(fh, filename)
+    if stream.peek() != '{':
+        yield from _iter_json_array(stream)
+        return
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        key = stream.value()
+        stream.expect(':')
+        if key == 'challenges':
+            yield from _iter_json_array(stream)
+        else:
+            stream.value()
+        if stream.peek() != ',':
+            break
+        stream.expect(',')
+    stream.expect('}')
+
+def iter_raw_records(path):
+    """Yield (source, record) pairs from a pack file or directory.
+
+    A file that cannot be read or parsed yields a ChallengePackError naming
+    it in place of the remaining records.
+    """
+    for filename in iter_pack_files(path):
+        try:
+            with open(filename, 'r', encoding='utf-8') as fh:
+                if filename.endswith('.jsonl'):
+                    for lineno, line in enumerate(fh, 1):
+                        line = line.strip()
+                        if not line:
+                            continue
+                        source = f'{filename}:{lineno}'
+                        try:
+                            yield source, json.loads(line)
+                        except ValueError as e:
+                            yield source, ChallengePackError(f'invalid JSON: {e}', source)
+                else:
+                    yield from iter_json_records(fh, filename)
+        except ChallengePackError as e:
+            yield filename, e
+        except (OSError, UnicodeDecodeError) as e:
+            yield filename, ChallengePackError(f'cannot read pack: {e}', filename)
+
+def normalize_record(record, source=None):
+    """Validate a raw record and return the column mapping to store"""
+    if isinstance(record, ChallengePackError):
+        raise record
+    if not isinstance(record, dict):
+        raise ChallengePackError('record must be an object', source)
+
+    missing = [field for field in REQUIRED_FIELDS if record.get(field) in (None, '')]
+    if missing:
+        raise ChallengePackError(f'missing fields: {", ".join(missing)}', source)
+
+    try:
+        level = int(record['level'])
+        points = int(record.get('points', 100))
+    except (TypeError, ValueError):
+        raise ChallengePackError('level and points must be integers', source)
+
+    category = record['category']
+    if category not in CATEGORIES:
+        raise ChallengePackError(f'unknown category {category!r}', source)
+    difficulty = record.get('difficulty', 'beginner')
+    if difficulty not in DIFFICULTIES:
+        raise ChallengePackError(f'unknown difficulty {difficulty!r}', source)
+
+    test_cases = record.get('test_cases') or []
+    hints = record.get('hints') or []
+    if not isinstance(test_cases, list) or not all(isinstance(c, dict) for c in test_cases):
+        raise ChallengePackError('test_cases must be a list of objects', source)
+    if not isinstance(hints, list):
+        raise ChallengePackError('hints must be a list', source)
+    for index, case in enumerate(test_cases):
+        for field in ('input', 'expected'):
+            if not isinstance(case.get(field, ''), (str, type(None))):
+                raise ChallengePackError(f'test case {index}: {field} must be a string', source)
+        try:
+            compile_test_case(case, category)
+        except (SyntaxError, ValueError) as e:
+            raise ChallengePackError(f'test case {index} does not compile: {getattr(e, "msg", e)}', source)
+
+    row = {
+        'level': level,
+        'title': str(record['title']).strip(),
+        'description': record['description'],
+        'category': category,
+        'difficulty': difficulty,
+        'points': points,
+        'test_cases': json.dumps(test_cases) if test_cases else None,
+        'hints': json.dumps(hints) if hints else None,
+        'is_active': bool(record.get('is_active', True))
+    }
+    for field in TEXT_FIELDS:
+        row[field] = record.get(field)
+    row['content_hash'] = content_hash(row)
+    return row
+
+def content_hash(row):
+    """Stable fingerprint of a normalized challenge row"""
+    payload = json.dumps(row, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def validate_records(pairs, report):
+    """Yield normalized rows, recording invalid ones on the report"""
+    for source, record in pairs:
+        try:
+            yield normalize_record(record, source)
+        except ChallengePackError as e:
+            report.errors.append(str(e))
+
+def chunked(iterable, size):
+    """Yield lists of up to size items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def upsert_chunk(rows, report):
+    """Insert new and update changed challenges for one chunk of rows"""
+    # Later records in a pack win over earlier ones with the same key
+    by_key = {(row['level'], row['title']): row for row in rows}
+    existing = db.session.query(
+        Challenge.id, Challenge.level, Challenge.title, Challenge.content_hash
+    ).filter(tuple_(Challenge.level, Challenge.title).in_(list(by_key))).all()
+    existing = {(level, title): (id_, digest) for id_, level, title, digest in existing}
+
+    now = datetime.utcnow()
+    inserts, updates = [], []
+    for key, row in by_key.items():
+        if key not in existing:
+            inserts.append(dict(row, created_at=now, updated_at=now))
+            continue
+        row_id, digest = existing[key]
+        if digest == row['content_hash']:
+            report.unchanged += 1
+        else:
+            updates.append(dict(row, id=row_id, updated_at=now))
+
+    if inserts:
+        db.session.bulk_insert_mappings(Challenge, inserts)
+    if updates:
+        db.session.bulk_update_mappings(Challenge, updates)
+    if inserts or updates:
+        db.session.commit()
+    report.inserted += len(inserts)
+    report.updated += len(updates)
+
+def load_challenge_pack(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream a challenge pack into the database and return a LoadReport"""
+    report = LoadReport()
+    rows = validate_records(iter_raw_records(path), report)
+    try:
+        for chunk in chunked(rows, chunk_size):
+            upsert_chunk(chunk, report)
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        # Bulk mappings bypass the session events that normally bump the version
+        if report.inserted or report.updated:
+            catalog.bump()
+    return report.finish()
@@ -5,10 +5,64 @@ class Config:
     # Basic Flask config
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     
+    # Fernet key for code solutions; generated lazily when unset
+    ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY')
+    
     # Database
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///python_pathfinder.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Challenge catalog cache; the version file must be shared by all workers
+    CATALOG_VERSION_FILE = os.environ.get('CATALOG_VERSION_FILE')
+    CATALOG_VERSION_CHECK_INTERVAL = 1.0  # seconds
+    
+    # Development index advisor (EXPLAIN QUERY PLAN on every distinct statement)
+    INDEX_ADVISOR = os.environ.get('INDEX_ADVISOR') == '1'
+    INDEX_ADVISOR_MIN_ROWS = int(os.environ.get('INDEX_ADVISOR_MIN_ROWS', 1000))
+    INDEX_ADVISOR_REPORT = os.environ.get('INDEX_ADVISOR_REPORT')
+    
+    # Prometheus-text /metrics endpoint
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # bearer token for scrapers; admins always allowed
+    
+    # On-demand profiler (admins via X-Profile: 1, or a sampled share of traffic)
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '1') == '1'
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0))
+    PROFILE_INTERVAL = 0.001  # seconds between stack samples
+    PROFILE_DIR = os.environ.get('PROFILE_DIR')
+    PROFILE_MAX_FILES = 200
+    
+    # Password hashing (runs in a bounded native thread pool)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))
+    
+    # Process-wide cache of hot user records (seconds / entries)
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 10))
+    USER_CACHE_SIZE = 10000
+    
+    # Rendered lesson/challenge pages (entries, shared across users)
+    RENDER_CACHE_ENABLED = os.environ.get('RENDER_CACHE_ENABLED', '1') == '1'
+    RENDER_CACHE_SIZE = 512
+    
+    # Leaderboard snapshots: max age (seconds) and cached pages
+    LEADERBOARD_SNAPSHOT_INTERVAL = float(os.environ.get('LEADERBOARD_SNAPSHOT_INTERVAL', 5))
+    LEADERBOARD_SNAPSHOT_PAGES = 256
+    
+    # Submission near-duplicate detection (estimated Jaccard similarity)
+    SIMILARITY_THRESHOLD = float(os.environ.get('SIMILARITY_THRESHOLD', 0.8))
+    
+    # Retention: older rows move to compressed monthly archive partitions
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR')  # default: <instance>/archive
+    SUBMISSION_RETENTION_DAYS = int(os.environ.get('SUBMISSION_RETENTION_DAYS', 180))
+    PROGRESS_RETENTION_DAYS = int(os.environ.get('PROGRESS_RETENTION_DAYS', 365))
+    
+    # Read/write split: @read_only views query a read-only pool (a replica
+    # when READ_DATABASE_URL is set, else WAL readers of the SQLite file)
+    READ_ROUTING_ENABLED = os.environ.get('READ_ROUTING_ENABLED', '1') == '1'
+    SQLALCHEMY_READ_DATABASE_URI = os.environ.get('READ_DATABASE_URL')
+    READ_POOL_SIZE = int(os.environ.get('READ_POOL_SIZE', 10))
+    READ_YOUR_WRITES_SECONDS = float(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+    
     # Session
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     
@@ -41,4 +95,11 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
-    WTF_CSRF_ENABLED = False
\ No newline at end of file
+    WTF_CSRF_ENABLED = False
+
+config = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+    'default': DevelopmentConfig
+}
\ No newline at end of file
@@ -0,0 +1,380 @@
+"""Streaming bulk export and import of progress, submissions and matches.
+
+Exports read the table through a server-side cursor (stream_results with
+yield_per), so only one chunk of rows is in memory at a time. They write
+NDJSON or CSV, optionally gzip-compressed. GameProgress.code_solution stays
+encrypted unless decryption is requested. In that case it is exported as
+code_solution_plain, and the importer re-encrypts it with the target
+instance's key. A row that cannot be decrypted with this instance's key is
+exported with a null code_solution_plain and the reason in
+code_solution_error, so one bad row does not abort a streaming export.
+
+Imports read the file as a stream and insert in batches, committing one
+transaction per batch. After each commit the number of records consumed is
+written to a checkpoint file, so an interrupted import resumes where it
+stopped. A row whose id already exists is skipped when its content matches
+the existing row, which makes re-running an import harmless. If the content
+differs, the import stops with a TransferError naming the conflicting ids
+instead of silently dropping the row. A row the database rejects (a NULL
+in a required column, say) rolls back its batch and stops the import with
+a TransferError naming the record; the checkpoint still covers every batch
+committed before it. On PostgreSQL the id sequence is moved past the
+imported ids, so later inserts do not collide with them.
+
+    flask --app "app:create_app()" export-data progress progress.ndjson.gz
+    GET /admin/export/submissions?format=csv&gzip=1
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import time
+import zlib
+from datetime import datetime
+
+from cryptography.fernet import InvalidToken
+from flask import Blueprint, Response, abort, request, stream_with_context
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from database import decrypt_data, encrypt_data
+from db_routing import read_only
+from models import db, GameProgress, CodeSubmission, MultiplayerMatch
+from profiling import is_admin
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_BATCH_SIZE = 1000
+FORMATS = ('ndjson', 'csv')
+
+TABLES = {
+    'progress': GameProgress,
+    'submissions': CodeSubmission,
+    'matches': MultiplayerMatch,
+}
+
+ENCRYPTED_COLUMN = 'code_solution'
+PLAIN_COLUMN = 'code_solution_plain'
+DECRYPT_ERROR_COLUMN = 'code_solution_error'
+
+class TransferError(ValueError):
+    """Raised for an unknown table or format, or a malformed import file"""
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.skipped = 0
+        self.resumed_from = 0
+        self.batches = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.inserted / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self):
+        return {
+            'inserted': self.inserted,
+            'skipped': self.skipped,
+            'resumed_from': self.resumed_from,
+            'batches': self.batches,
+            'elapsed': round(self.elapsed, 3),
+            'rows_per_sec': round(self.rows_per_sec, 1)
+        }
+
+def get_model(name):
+    try:
+        return TABLES[name]
+    except KeyError:
+        raise TransferError(f"unknown table {name!r} (expected one of {', '.join(TABLES)})")
+
+def _check_format(fmt):
+    if fmt not in FORMATS:
+        raise TransferError(f"unknown format {fmt!r} (expected one of {', '.join(FORMATS)})")
+
+def export_columns(model, decrypt=False):
+    names = [column.name for column in model.__table__.columns]
+    if decrypt and ENCRYPTED_COLUMN in names:
+        names[names.index(ENCRYPTED_COLUMN)] = PLAIN_COLUMN
+        names.append(DECRYPT_ERROR_COLUMN)
+    return names
+
+def iter_records(model, decrypt=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield export dicts for every row of model, in id order"""
+    table = model.__table__
+    names = export_columns(model, decrypt)
+    encrypted_index = None
+    if decrypt and ENCRYPTED_COLUMN in table.columns:
+        encrypted_index = list(table.columns.keys()).index(ENCRYPTED_COLUMN)
+
+    result = db.session.execute(
+        db.select(table).order_by(table.c.id),
+        execution_options={'stream_results': True, 'yield_per': chunk_size})
+    for row in result:
+        values = [value.isoformat() if isinstance(value, datetime) else value for value in row]
+        if encrypted_index is not None:
+            error = None
+            if values[encrypted_index]:
+                try:
+                    values[encrypted_index] = json.dumps(decrypt_data(values[encrypted_index]))
+                except (InvalidToken, ValueError) as e:
+                    values[encrypted_index] = None
+                    error = f'cannot decrypt: {type(e).__name__}'
+            values.append(error)
+        yield dict(zip(names, values))
+
+def _chunks(records, fieldnames, fmt, chunk_size):
+    buffer = io.StringIO()
+    writer = None
+    if fmt == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+        writer.writeheader()
+    pending = 0
+    for record in records:
+        if writer is not None:
+            writer.writerow(record)
+        else:
+            buffer.write(json.dumps(record, separators=(',', ':')))
+            buffer.write('\n')
+        pending += 1
+        if pending >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def iter_export(model, fmt='ndjson', decrypt=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the export as text chunks of chunk_size records"""
+    _check_format(fmt)
+    records = iter_records(model, decrypt, chunk_size)
+    return _chunks(records, export_columns(model, decrypt), fmt, chunk_size)
+
+def gzip_chunks(chunks):
+    """Gzip-compress a stream of text chunks incrementally"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_to_file(model, path, fmt=None, compress=None, decrypt=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write an export to path; format and gzip default from the file name.
+
+    Returns the number of records written.
+    """
+    base = path[:-3] if path.endswith('.gz') else path
+    fmt = fmt or ('csv' if base.endswith('.csv') else 'ndjson')
+    compress = path.endswith('.gz') if compress is None else compress
+    _check_format(fmt)
+
+    count = 0
+
+    def counted():
+        nonlocal count
+        for record in iter_records(model, decrypt, chunk_size):
+            count += 1
+            yield record
+
+    opener = gzip.open if compress else open
+    with opener(path, 'wt', encoding='utf-8', newline='') as fh:
+        for chunk in _chunks(counted(), export_columns(model, decrypt), fmt, chunk_size):
+            fh.write(chunk)
+    return count
+
+def _open_text(path):
+    with open(path, 'rb') as fh:
+        compressed = fh.read(2) == b'\x1f\x8b'
+    if compressed:
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+def _iter_file_records(fh, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(fh)
+        return
+    for line_number, line in enumerate(fh, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise TransferError(f'line {line_number}: {e}')
+
+def _converters(model):
+    converters = {}
+    for column in model.__table__.columns:
+        python_type = column.type.python_type
+        if python_type is datetime:
+            converters[column.name] = datetime.fromisoformat
+        elif python_type is bool:
+            converters[column.name] = lambda value: value in (True, 1, '1', 'true', 'True')
+        elif python_type in (int, float):
+            converters[column.name] = python_type
+    return converters
+
+def _to_mapping(record, columns, converters):
+    mapping = {}
+    for name in columns:
+        value = record.get(name)
+        convert = converters.get(name)
+        if convert is not None and isinstance(value, str):
+            # CSV has no null: an empty non-text cell imports as NULL
+            value = convert(value) if value != '' else None
+        mapping[name] = value
+    plain = record.get(PLAIN_COLUMN)
+    if ENCRYPTED_COLUMN in columns and plain not in (None, ''):
+        mapping[ENCRYPTED_COLUMN] = encrypt_data(json.loads(plain))
+    return mapping
+
+def _read_checkpoint(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh).get('records', 0)
+    except FileNotFoundError:
+        return 0
+
+def _write_checkpoint(path, records):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as fh:
+        json.dump({'records': records, 'updated_at': datetime.utcnow().isoformat()}, fh)
+    os.replace(tmp_path, path)
+
+def _same_row(existing, row):
+    """Whether an incoming mapping has the same content as a stored row"""
+    for name, value in row.items():
+        current = existing[name]
+        if name == ENCRYPTED_COLUMN and current != value and current and value:
+            # Re-encrypted solutions differ byte-wise; compare the plaintext
+            try:
+                current, value = decrypt_data(current), decrypt_data(value)
+            except (InvalidToken, ValueError):
+                return False
+        # CSV cannot tell NULL from an empty string
+        if current != value and not (current in (None, '') and value in (None, '')):
+            return False
+    return True
+
+def _sync_id_sequence(table):
+    """Move a PostgreSQL id sequence past ids inserted explicitly"""
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return
+    db.session.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), MAX(id)) FROM {table.name} "
+        'HAVING MAX(id) IS NOT NULL'))
+
+def _find_rejected_row(table, rows):
+    """Index of the first row the database refuses to insert, and the reason"""
+    for index, row in enumerate(rows):
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert(), [row])
+        except IntegrityError as e:
+            return index, e.orig
+    return None, None
+
+def _insert_batch(model, batch, report, first_position=1):
+    table = model.__table__
+    ids = [row['id'] for row in batch if row.get('id') is not None]
+    existing = {}
+    if ids:
+        result = db.session.execute(db.select(table).where(table.c.id.in_(ids)))
+        existing = {row.id: row._mapping for row in result}
+    conflicts = [row['id'] for row in batch
+                 if row.get('id') in existing and not _same_row(existing[row['id']], row)]
+    if conflicts:
+        db.session.rollback()
+        shown = ', '.join(str(id_) for id_ in conflicts[:10])
+        more = f' and {len(conflicts) - 10} more' if len(conflicts) > 10 else ''
+        raise TransferError(f'{table.name}: ids {shown}{more} already exist with different content; '
+                            'import into an empty table or remove the conflicting rows first')
+    rows = [row for row in batch if row.get('id') not in existing]
+    if rows:
+        try:
+            db.session.execute(table.insert(), rows)
+        except IntegrityError as e:
+            db.session.rollback()
+            index, reason = _find_rejected_row(table, rows)
+            db.session.rollback()
+            if index is None:
+                raise TransferError(f'{table.name}: batch starting at record {first_position} '
+                                    f'was rejected: {e.orig}')
+            position = first_position + next(i for i, row in enumerate(batch) if row is rows[index])
+            raise TransferError(f'{table.name}: record {position} was rejected: {reason}')
+        if any(row.get('id') is not None for row in rows):
+            _sync_id_sequence(table)
+    db.session.commit()
+    report.inserted += len(rows)
+    report.skipped += len(batch) - len(rows)
+    report.batches += 1
+
+def import_file(model, path, fmt=None, batch_size=DEFAULT_BATCH_SIZE, checkpoint=None):
+    """Bulk-load an export into model's table in batched transactions.
+
+    checkpoint defaults to '<path>.checkpoint'; it is removed once the
+    whole file has been imported.
+    """
+    base = path[:-3] if path.endswith('.gz') else path
+    fmt = fmt or ('csv' if base.endswith('.csv') else 'ndjson')
+    _check_format(fmt)
+    checkpoint = checkpoint or f'{path}.checkpoint'
+    columns = [column.name for column in model.__table__.columns]
+    converters = _converters(model)
+
+    report = ImportReport()
+    report.resumed_from = done = _read_checkpoint(checkpoint)
+    start = time.perf_counter()
+    batch = []
+    with _open_text(path) as fh:
+        try:
+            for position, record in enumerate(_iter_file_records(fh, fmt), 1):
+                if position <= done:
+                    continue
+                batch.append(_to_mapping(record, columns, converters))
+                if len(batch) >= batch_size:
+                    _insert_batch(model, batch, report, position - len(batch) + 1)
+                    _write_checkpoint(checkpoint, position)
+                    done = position
+                    batch = []
+            if batch:
+                _insert_batch(model, batch, report, done + 1)
+        except TransferError as e:
+            raise TransferError(f'{e} ({done} records imported; {checkpoint} resumes after them)')
+    report.elapsed = time.perf_counter() - start
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return report
+
+transfer_bp = Blueprint('data_transfer', __name__, url_prefix='/admin/export')
+
+@transfer_bp.before_request
+def _require_admin():
+    if not is_admin():
+        abort(403)
+
+@transfer_bp.route('/<table>')
+@read_only
+def export_table(table):
+    if table not in TABLES:
+        abort(404)
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        abort(400)
+    decrypt = request.args.get('decrypt') == '1'
+    compress = request.args.get('gzip') == '1'
+
+    chunks = iter_export(TABLES[table], fmt, decrypt)
+    filename = f"{table}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{fmt}"
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    if compress:
+        chunks = gzip_chunks(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+def init_app(app):
+    """Register the admin export endpoint"""
+    app.register_blueprint(transfer_bp)
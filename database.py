@@ -3,16 +3,40 @@ import hashlib
 import json
 from cryptography.fernet import Fernet
 import base64
+import os
 from datetime import datetime
+from flask import current_app, has_app_context
 
-# Generate a key for encryption (store securely in production)
-key = Fernet.generate_key()
-cipher_suite = Fernet(key)
+_cipher_suite = None
+
+def get_cipher():
+    """Return the shared Fernet cipher, creating it on first use"""
+    global _cipher_suite
+    if _cipher_suite is None:
+        # Use the app's ENCRYPTION_KEY when set so every worker can read every
+        # row; otherwise generate a key (store securely in production)
+        key = current_app.config.get('ENCRYPTION_KEY') if has_app_context() else os.environ.get('ENCRYPTION_KEY')
+        _cipher_suite = Fernet(key or Fernet.generate_key())
+    return _cipher_suite
+
+def encrypt_data(data):
+    """Encrypt sensitive data"""
+    if isinstance(data, dict):
+        data = json.dumps(data)
+    encrypted = get_cipher().encrypt(data.encode())
+    return base64.b64encode(encrypted).decode()
+
+def decrypt_data(encrypted_data):
+    """Decrypt encrypted data"""
+    decoded = base64.b64decode(encrypted_data)
+    decrypted = get_cipher().decrypt(decoded)
+    return json.loads(decrypted.decode())
 
 class Database:
-    def __init__(self, db_name='python_pathfinder.db'):
+    def __init__(self, db_name='python_pathfinder.db', init=True):
         self.db_name = db_name
-        self.init_tables()
+        if init:
+            self.init_tables()
     
     def get_connection(self):
         return sqlite3.connect(self.db_name)
@@ -67,16 +91,11 @@ class Database:
     
     def encrypt_data(self, data):
         """Encrypt sensitive data"""
-        if isinstance(data, dict):
-            data = json.dumps(data)
-        encrypted = cipher_suite.encrypt(data.encode())
-        return base64.b64encode(encrypted).decode()
+        return encrypt_data(data)
     
     def decrypt_data(self, encrypted_data):
         """Decrypt encrypted data"""
-        decoded = base64.b64decode(encrypted_data)
-        decrypted = cipher_suite.decrypt(decoded)
-        return json.loads(decrypted.decode())
+        return decrypt_data(encrypted_data)
     
     def create_user(self, username, email, password, theme='cute'):
         """Create a new user with encrypted password"""
@@ -161,8 +180,8 @@ class Database:
             'highest_level': stats[2] or 0
         }
 
-# Initialize database
-db = Database()
+# Tables are created by init_tables() (see scripts/init_db.py), not on import
+db = Database(init=False)
 
 # Convenience functions
 init_db = db.init_tables
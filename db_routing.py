@@ -0,0 +1,101 @@
+"""Route read-only work to a separate pool of read-only connections.
+
+Views decorated with @read_only run their SELECTs on the 'read' bind, so
+long leaderboard, stats, history and export reads never hold connections
+or locks the write path needs. Everything else, and every flush or DML
+statement, goes to the primary engine as before.
+
+The read bind is SQLALCHEMY_READ_DATABASE_URI when it is set (a replica).
+Otherwise a file-backed SQLite database is opened a second time with
+mode=ro, and the primary is switched to WAL journaling, so readers see
+the last committed state without blocking writers or being blocked by
+them. Other configurations get no read bind and nothing is rerouted.
+
+Read-your-writes:
+- A request that has flushed anything reads from the primary for the
+  rest of that request.
+- With a replica, which may lag, a user who wrote is pinned to the
+  primary for READ_YOUR_WRITES_SECONDS. The deadline is kept in their
+  session cookie, so it holds across workers. WAL readers never lag, so
+  SQLite readers are never pinned.
+"""
+import functools
+import time
+
+from flask import current_app, g, has_app_context, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+READ_BIND = 'read'
+_PRIMARY_UNTIL = '_db_primary_until'
+
+class RoutingSession(Session):
+    """Session that sends SELECTs from read-only views to the read bind"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and clause is not None and clause.is_select
+                and g.get('_db_read_only') and not g.get('_db_wrote')):
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(db_session, flush_context):
+    if not has_app_context():
+        return
+    g._db_wrote = True
+    seconds = current_app.config.get('READ_YOUR_WRITES_SECONDS', 0)
+    if has_request_context() and seconds and current_app.config.get('SQLALCHEMY_READ_DATABASE_URI'):
+        session[_PRIMARY_UNTIL] = time.time() + seconds
+
+def read_only(view):
+    """Run a view's queries on the read bind unless the user just wrote"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g._db_read_only = session.get(_PRIMARY_UNTIL, 0) <= time.time()
+        return view(*args, **kwargs)
+    return wrapper
+
+def _read_only_sqlite_url(url):
+    """The same SQLite file as url, opened read-only, or None"""
+    url = make_url(url)
+    if not url.drivername.startswith('sqlite') or url.database in (None, '', ':memory:'):
+        return None
+    if url.query.get('uri'):
+        return None
+    return url.set(database='file:' + url.database, query=dict(url.query, mode='ro', uri='true'))
+
+def _enable_wal(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.close()
+
+def _query_only(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA query_only=ON')
+    cursor.close()
+
+def init_app(app):
+    """Register the read bind; call before db.init_app(app)"""
+    if not app.config.get('READ_ROUTING_ENABLED', True):
+        return
+    replica = app.config.get('SQLALCHEMY_READ_DATABASE_URI')
+    url = replica or _read_only_sqlite_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url is None:
+        return
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds[READ_BIND] = {'url': url, 'pool_size': app.config.get('READ_POOL_SIZE', 10)}
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+def install_listeners(app, db):
+    """Switch a SQLite primary to WAL and make its readers query-only"""
+    with app.app_context():
+        engines = db.engines
+        primary, reader = engines[None], engines.get(READ_BIND)
+    if reader is None or reader.dialect.name != 'sqlite':
+        return
+    if not event.contains(primary, 'connect', _enable_wal):
+        event.listen(primary, 'connect', _enable_wal)
+        event.listen(reader, 'connect', _query_only)
@@ -0,0 +1,123 @@
+"""Development-mode index advisor.
+
+When INDEX_ADVISOR is enabled, every distinct SQL statement the app issues
+is captured together with one sample set of parameters. At process exit
+(or on demand via report()) each captured SELECT/UPDATE/DELETE is run
+through SQLite's EXPLAIN QUERY PLAN and full table scans on tables larger
+than INDEX_ADVISOR_MIN_ROWS are reported:
+
+    INDEX_ADVISOR=1 INDEX_ADVISOR_REPORT=scans.json python app.py
+
+Only SQLite is supported; on other backends the advisor stays inactive.
+"""
+import atexit
+import json
+import re
+import sys
+import threading
+
+from sqlalchemy import event
+
+from models import db
+
+_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(.*)$')
+_EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+class IndexAdvisor:
+    """Collects statements and explains them against the live database"""
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.statements = {}
+        self.engine = None
+        self.min_rows = 1000
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('INDEX_ADVISOR'):
+            return
+        with app.app_context():
+            engine = db.engine
+        if engine.dialect.name != 'sqlite':
+            app.logger.warning('Index advisor only supports SQLite; disabled')
+            return
+        self.engine = engine
+        self.min_rows = app.config.get('INDEX_ADVISOR_MIN_ROWS', 1000)
+        event.listen(engine, 'before_cursor_execute', self._capture)
+        app.extensions['index_advisor'] = self
+
+        report_path = app.config.get('INDEX_ADVISOR_REPORT')
+        atexit.register(self.write_report, report_path)
+
+    def _capture(self, conn, cursor, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith(_EXPLAINABLE):
+            return
+        if statement not in self.statements:
+            with self._lock:
+                self.statements.setdefault(statement, parameters)
+
+    def _resolve_table(self, name, statement, tables):
+        if name in tables:
+            return name
+        # SQLAlchemy aliases render as "users AS users_1"
+        match = re.search(r'(\w+) AS %s\b' % re.escape(name), statement)
+        return match.group(1) if match else name
+
+    def report(self):
+        """Return a list of full-scan findings for the captured statements"""
+        if self.engine is None:
+            return []
+        findings = []
+        row_counts = {}
+        raw = self.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            tables = {row[0] for row in cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'")}
+            with self._lock:
+                captured = list(self.statements.items())
+            for statement, parameters in captured:
+                try:
+                    plan = cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters or ()).fetchall()
+                except Exception as e:
+                    findings.append({'statement': statement, 'error': str(e)})
+                    continue
+                for row in plan:
+                    match = _SCAN_RE.match(row[-1])
+                    if not match or 'USING' in match.group(2):
+                        continue
+                    table = self._resolve_table(match.group(1), statement, tables)
+                    if table not in tables:
+                        continue
+                    if table not in row_counts:
+                        row_counts[table] = cursor.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+                    if row_counts[table] >= self.min_rows:
+                        findings.append({
+                            'table': table,
+                            'rows': row_counts[table],
+                            'plan': [r[-1] for r in plan],
+                            'statement': statement
+                        })
+        finally:
+            raw.close()
+        return findings
+
+    def write_report(self, path=None):
+        """Write findings as JSON to path, or a summary to stderr"""
+        findings = self.report()
+        if path:
+            with open(path, 'w') as fh:
+                json.dump({'statements': len(self.statements), 'findings': findings}, fh, indent=2)
+            return findings
+        if findings:
+            print(f'Index advisor: {len(findings)} full table scan(s) '
+                  f'in {len(self.statements)} distinct statements', file=sys.stderr)
+            for finding in findings:
+                if 'error' in finding:
+                    continue
+                print(f"  SCAN {finding['table']} ({finding['rows']} rows): "
+                      f"{' '.join(finding['statement'].split())[:200]}", file=sys.stderr)
+        return findings
+
+index_advisor = IndexAdvisor()
@@ -0,0 +1,265 @@
+"""Built-in latency and SQL instrumentation exposed as Prometheus text.
+
+Every Flask route and every Socket.IO event handler records:
+
+- wall-clock latency
+- number of SQL statements and time spent in SQL (via SQLAlchemy events)
+- Socket.IO messages emitted, per event name
+
+Histograms have fixed buckets and are updated without locks (a bisect and
+a few integer additions), so memory is bounded by the number of routes and
+events, and the per-request overhead is a few microseconds. Everything is
+served from /metrics, to admins or to scrapers that send METRICS_TOKEN as
+a bearer token.
+"""
+import hmac
+import inspect
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from flask import Blueprint, Response, current_app, g, has_app_context, request
+from flask_socketio import SocketIO
+from sqlalchemy import event
+
+import profiling
+from models import db
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+class Histogram:
+    """Fixed-bucket histogram; observe() takes no lock"""
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Counter:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class MetricFamily:
+    """A named metric with one child per label combination"""
+
+    def __init__(self, name, documentation, labelnames=(), kind='histogram', buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+        self.buckets = buckets
+        self.children = {}
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            child = Histogram(self.buckets) if self.kind == 'histogram' else Counter()
+            # setdefault keeps the first child if two greenlets race here
+            child = self.children.setdefault(values, child)
+        return child
+
+    def observe(self, value):
+        """Shortcut for metrics without labels"""
+        self.labels().observe(value)
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _label_text(self, values, extra=None):
+        pairs = list(zip(self.labelnames, values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+        return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for values, child in list(self.children.items()):
+            if self.kind == 'counter':
+                lines.append(f'{self.name}{self._label_text(values)} {child.value}')
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{self._label_text(values, ("le", bound))} {cumulative}')
+            lines.append(f'{self.name}_bucket{self._label_text(values, ("le", "+Inf"))} {child.count}')
+            lines.append(f'{self.name}_sum{self._label_text(values)} {child.sum}')
+            lines.append(f'{self.name}_count{self._label_text(values)} {child.count}')
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.families = {}
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.families.setdefault(name, MetricFamily(name, documentation, labelnames, 'histogram', buckets))
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.families.setdefault(name, MetricFamily(name, documentation, labelnames, 'counter'))
+
+    def render(self):
+        lines = []
+        for family in self.families.values():
+            lines.extend(family.render())
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+http_latency = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ('method', 'route'))
+http_requests = registry.counter(
+    'http_requests_total', 'HTTP requests served', ('method', 'route', 'status'))
+http_sql_statements = registry.histogram(
+    'http_request_sql_statements', 'SQL statements per HTTP request', ('route',), COUNT_BUCKETS)
+http_sql_time = registry.histogram(
+    'http_request_sql_seconds', 'Time spent in SQL per HTTP request', ('route',))
+socket_latency = registry.histogram(
+    'socketio_event_duration_seconds', 'Socket.IO event handler latency', ('event',))
+socket_events = registry.counter(
+    'socketio_events_total', 'Socket.IO events handled', ('event', 'outcome'))
+socket_sql_statements = registry.histogram(
+    'socketio_event_sql_statements', 'SQL statements per Socket.IO event', ('event',), COUNT_BUCKETS)
+socket_sql_time = registry.histogram(
+    'socketio_event_sql_seconds', 'Time spent in SQL per Socket.IO event', ('event',))
+socket_emitted = registry.counter(
+    'socketio_emitted_messages_total', 'Socket.IO messages emitted', ('event',))
+sandbox_queue_wait = registry.histogram(
+    'sandbox_queue_wait_seconds', 'Time a submission waited before evaluation started')
+sandbox_execution = registry.histogram(
+    'sandbox_execution_seconds', 'Time spent evaluating a submission')
+
+# SQL accounting: statements are attributed to whatever request or Socket.IO
+# event is active in the current app context (flask.g)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_metrics_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    if has_app_context():
+        scope = g.get('_sql_scope')
+        if scope is not None:
+            scope[0] += 1
+            scope[1] += elapsed
+
+def start_scope():
+    """Begin timing the current request or event; returns the start time"""
+    g._sql_scope = [0, 0.0]
+    return time.perf_counter()
+
+def sql_totals():
+    """(statement_count, seconds) recorded in the current scope"""
+    scope = g.get('_sql_scope')
+    return (scope[0], scope[1]) if scope else (0, 0.0)
+
+def _route_label():
+    return request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+
+def _before_request():
+    g._metrics_start = start_scope()
+
+def _after_request(response):
+    start = g.pop('_metrics_start', None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    route = _route_label()
+    statements, sql_seconds = sql_totals()
+    http_latency.labels(request.method, route).observe(elapsed)
+    http_requests.labels(request.method, route, response.status_code).inc()
+    http_sql_statements.labels(route).observe(statements)
+    http_sql_time.labels(route).observe(sql_seconds)
+    return response
+
+def _takes_arguments(handler):
+    return any(param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD, param.VAR_POSITIONAL)
+               for param in inspect.signature(handler).parameters.values())
+
+class InstrumentedSocketIO(SocketIO):
+    """SocketIO that times every @on handler and counts emitted messages"""
+
+    def on(self, message, namespace=None):
+        register = super().on(message, namespace)
+
+        def decorator(handler):
+            # Flask-SocketIO calls connect handlers with an auth argument and
+            # retries without it on TypeError. Dropping it here for handlers
+            # that take none means a TypeError is always a real failure
+            drop_auth = message == 'connect' and not _takes_arguments(handler)
+
+            @wraps(handler)
+            def timed(*args):
+                start = start_scope()
+                g._event_received_at = start
+                requested = bool(args and isinstance(args[0], dict) and args[0].get('_profile'))
+                profiling.start_profile('socketio', message, requested)
+                outcome = 'ok'
+                try:
+                    return handler() if drop_auth else handler(*args)
+                except Exception:
+                    outcome = 'error'
+                    raise
+                finally:
+                    profiling.finish_profile()
+                    elapsed = time.perf_counter() - start
+                    statements, sql_seconds = sql_totals()
+                    socket_latency.labels(message).observe(elapsed)
+                    socket_events.labels(message, outcome).inc()
+                    socket_sql_statements.labels(message).observe(statements)
+                    socket_sql_time.labels(message).observe(sql_seconds)
+            register(timed)
+            return handler
+        return decorator
+
+    def emit(self, event, *args, **kwargs):
+        socket_emitted.labels(event).inc()
+        return super().emit(event, *args, **kwargs)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+def _authorized():
+    """Admins, or scrapers sending 'Authorization: Bearer <METRICS_TOKEN>'"""
+    token = current_app.config.get('METRICS_TOKEN')
+    header = request.headers.get('Authorization', '')
+    if token and header.startswith('Bearer ') and hmac.compare_digest(header[7:].encode(), token.encode()):
+        return True
+    return profiling.is_admin()
+
+@metrics_bp.route('/metrics')
+def metrics_endpoint():
+    if not current_app.config.get('METRICS_ENABLED', True):
+        return Response('metrics disabled\n', status=404, mimetype='text/plain')
+    if not _authorized():
+        return Response('forbidden\n', status=403, mimetype='text/plain')
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+def init_app(app):
+    """Install request hooks, SQL listeners and the /metrics endpoint"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.register_blueprint(metrics_bp)
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
@@ -1,8 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import validates
 from datetime import datetime
 import json
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -17,11 +19,40 @@ class User(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     is_admin = db.Column(db.Boolean, default=False)
     
+    # Case-folded copies for indexed login/registration lookups
+    username_lower = db.Column(db.String(80), unique=True, index=True)
+    email_lower = db.Column(db.String(120), unique=True, index=True)
+    
     # Relationships
     progress = db.relationship('GameProgress', backref='user', lazy='dynamic')
     multiplayer_stats = db.relationship('MultiplayerStats', backref='user', uselist=False)
     achievements = db.relationship('Achievement', secondary='user_achievements', backref='users')
     
+    @validates('username')
+    def _set_username_lower(self, key, value):
+        self.username_lower = value.lower() if value else value
+        return value
+    
+    @validates('email')
+    def _set_email_lower(self, key, value):
+        self.email_lower = value.lower() if value else value
+        return value
+    
+    @classmethod
+    def find_by_login(cls, identifier):
+        """Look up a user by username or email, case-insensitively"""
+        key = identifier.strip().lower()
+        # Try the likelier column first so a hit costs one index lookup
+        if '@' in key:
+            columns = (cls.email_lower, cls.username_lower)
+        else:
+            columns = (cls.username_lower, cls.email_lower)
+        for column in columns:
+            user = cls.query.filter(column == key).first()
+            if user:
+                return user
+        return None
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -80,9 +111,15 @@ class Challenge(db.Model):
     
     # Metadata
     is_active = db.Column(db.Boolean, default=True)
+    content_hash = db.Column(db.String(64))  # sha256 of the pack record, see challenge_loader
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Challenge packs upsert by (level, title)
+    __table_args__ = (
+        db.UniqueConstraint('level', 'title', name='unique_challenge_level_title'),
+    )
+    
     def get_test_cases(self):
         if self.test_cases:
             return json.loads(self.test_cases)
@@ -159,6 +196,13 @@ class MultiplayerMatch(db.Model):
     winner = db.relationship('User', foreign_keys=[winner_id])
     challenge = db.relationship('Challenge')
     
+    # Room lookups by status, and per-player history paged by id
+    __table_args__ = (
+        db.Index('idx_match_room_status', 'room_id', 'status'),
+        db.Index('idx_match_player1', 'player1_id', 'id'),
+        db.Index('idx_match_player2', 'player2_id', 'id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -181,7 +225,7 @@ class Achievement(db.Model):
     description = db.Column(db.Text)
     icon = db.Column(db.String(100))
     points = db.Column(db.Integer, default=10)
-    criteria = db.Column(db.String(100))  # e.g., "complete_level_5", "win_10_matches"
+    criteria = db.Column(db.String(100), index=True)  # e.g., "complete_level_5", "win_10_matches"
     category = db.Column(db.String(50))  # learning, multiplayer, speed, accuracy
     
     def to_dict(self):
@@ -219,6 +263,11 @@ class Leaderboard(db.Model):
     
     user = db.relationship('User')
     
+    # Serves ORDER BY total_score DESC with keyset paging on (total_score, id)
+    __table_args__ = (
+        db.Index('idx_leaderboard_score', 'total_score', 'id'),
+    )
+    
     def to_dict(self):
         return {
             'username': self.user.username,
@@ -246,6 +295,10 @@ class CodeSubmission(db.Model):
     user = db.relationship('User')
     challenge = db.relationship('Challenge')
     
+    __table_args__ = (
+        db.Index('idx_submission_user_challenge_time', 'user_id', 'challenge_id', 'submitted_at'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -260,12 +313,93 @@ class CodeSubmission(db.Model):
             'submitted_at': self.submitted_at.isoformat()
         }
 
+class SubmissionFingerprint(db.Model):
+    """MinHash signature of a code submission (see similarity.py)"""
+    __tablename__ = 'submission_fingerprints'
+    
+    submission_id = db.Column(db.Integer, db.ForeignKey('code_submissions.id'), primary_key=True)
+    challenge_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    signature = db.Column(db.LargeBinary, nullable=False)
+    indexed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SubmissionLSHBucket(db.Model):
+    """One LSH band hash of a fingerprint; equal rows mark candidate near-duplicates"""
+    __tablename__ = 'submission_lsh_buckets'
+    
+    challenge_id = db.Column(db.Integer, primary_key=True)
+    band = db.Column(db.Integer, primary_key=True)
+    bucket_hash = db.Column(db.BigInteger, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('code_submissions.id'), primary_key=True)
+    
+    # Lookups of one submission's bands when querying its near-duplicates
+    __table_args__ = (
+        db.Index('idx_lsh_submission', 'submission_id'),
+    )
+
+class AnalyticsBucket(db.Model):
+    """One bucket count of a per-level or per-challenge histogram (see analytics.py)"""
+    __tablename__ = 'analytics_buckets'
+    
+    scope = db.Column(db.String(20), primary_key=True)  # level, challenge
+    key = db.Column(db.Integer, primary_key=True)  # level number or challenge id
+    metric = db.Column(db.String(20), primary_key=True)  # time_taken, attempts
+    bucket = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class ArchiveSummary(db.Model):
+    """Online totals for one user's rows in one archived monthly partition"""
+    __tablename__ = 'archive_summaries'
+    
+    table_name = db.Column(db.String(50), primary_key=True)  # game_progress, code_submissions
+    partition = db.Column(db.String(7), primary_key=True)  # YYYY-MM
+    user_id = db.Column(db.Integer, primary_key=True)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    score_total = db.Column(db.Integer, nullable=False, default=0)
+    max_level = db.Column(db.Integer)
+    first_at = db.Column(db.DateTime)
+    last_at = db.Column(db.DateTime)
+    
+    # Read-through looks up a user's partitions per table
+    __table_args__ = (
+        db.Index('idx_archive_user', 'user_id', 'table_name'),
+    )
+
+class ArchiveSegment(db.Model):
+    """Byte range of one gzip member holding a single user's rows in a partition file"""
+    __tablename__ = 'archive_segments'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    partition = db.Column(db.String(7), nullable=False)  # YYYY-MM
+    user_id = db.Column(db.Integer, nullable=False)
+    byte_offset = db.Column(db.BigInteger, nullable=False)
+    byte_length = db.Column(db.Integer, nullable=False)
+    rows = db.Column(db.Integer, nullable=False)
+    
+    # History reads only the segments of one user
+    __table_args__ = (
+        db.Index('idx_archive_segment_user', 'user_id', 'table_name', 'partition'),
+    )
+
+class UserSkill(db.Model):
+    """Per-user skill vector for challenge recommendations (see recommender.py)"""
+    __tablename__ = 'user_skills'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    skills = db.Column(db.LargeBinary, nullable=False)  # float32 per recommender.CATEGORIES entry
+    completed_levels = db.Column(db.LargeBinary, nullable=False, default=b'')  # bitmap, bit n = level n
+    max_level = db.Column(db.Integer, nullable=False, default=0)
+    results = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 # Initialize database function
-def init_db(app):
-    db.init_app(app)
+def init_db(app, seed=True):
+    """Migrate the schema and optionally seed sample data for an app"""
+    from scripts.init_db import init_database
+
     with app.app_context():
-        db.create_all()
-        create_sample_data()
+        init_database(seed=seed)
     
     return db
 
@@ -322,9 +456,7 @@ def create_sample_data():
             )
         ]
         
-        for challenge in sample_challenges:
-            db.session.add(challenge)
-        
+        db.session.add_all(sample_challenges)
         db.session.commit()
     
     # Create sample achievements
@@ -372,7 +504,5 @@ def create_sample_data():
             )
         ]
         
-        for achievement in sample_achievements:
-            db.session.add(achievement)
-        
+        db.session.add_all(sample_achievements)
         db.session.commit()
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""Keyset (cursor) pagination helpers.
+
+Pages are addressed by the sort key of the last row instead of an OFFSET,
+so fetching page 1000 costs the same index seek as page 1. Cursors are
+opaque url-safe tokens wrapping the JSON-encoded sort key.
+"""
+import base64
+import json
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a malformed cursor"""
+
+def encode_cursor(values):
+    """Encode the sort key of the last row on a page"""
+    raw = json.dumps(list(values), separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token, size):
+    """Decode a cursor produced by encode_cursor into a list of size values"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Clamp a client supplied page size"""
+    try:
+        limit = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+def after_keyset(columns, values):
+    """Filter for rows strictly after values when ordering columns descending"""
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        equal = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, column < value))
+    return or_(*clauses)
+
+def paginate(query, columns, cursor, limit):
+    """Apply keyset paging to a query ordered by columns descending.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    The key values are read from the trailing len(columns) entries of each
+    row, so callers must append the sort columns to their projection.
+    """
+    values = decode_cursor(cursor, len(columns))
+    if values is not None:
+        query = query.filter(after_keyset(columns, values))
+    query = query.order_by(*[column.desc() for column in columns])
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-len(columns):])
+    return rows, next_cursor
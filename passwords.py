@@ -0,0 +1,77 @@
+"""Password hashing off the event loop.
+
+Passwords are hashed with a slow KDF (PASSWORD_HASH_METHOD, scrypt by
+default). Doing that inline would stall the eventlet hub for every other
+connection during each login, so hashing and verification run in a
+bounded pool of native threads; hashlib releases the GIL while it works.
+Under eventlet the pool is eventlet.tpool, otherwise a ThreadPoolExecutor
+with PASSWORD_HASH_WORKERS threads.
+
+Hashes from before the KDF switch (bare SHA-256 hex digests) still verify,
+and verify_password() reports that they need a rehash so login can
+upgrade them transparently.
+"""
+import hashlib
+import hmac
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt'
+DEFAULT_WORKERS = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _eventlet_patched():
+    try:
+        from eventlet import patcher
+    except ImportError:
+        return False
+    return patcher.is_monkey_patched('thread')
+
+def _run_in_pool(func, *args):
+    """Run func in a native worker thread and wait for the result"""
+    global _executor
+    if _eventlet_patched():
+        from eventlet import tpool
+        return tpool.execute(func, *args)
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = current_app.config.get('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS)
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+    return _executor.submit(func, *args).result()
+
+def _method():
+    return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+
+def _is_legacy(stored_hash):
+    return len(stored_hash) == 64 and '$' not in stored_hash
+
+def _verify(stored_hash, password):
+    if _is_legacy(stored_hash):
+        digest = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(stored_hash, digest)
+    return check_password_hash(stored_hash, password)
+
+def hash_password(password):
+    """Hash a password with the configured KDF"""
+    return _run_in_pool(generate_password_hash, password, _method())
+
+def needs_rehash(stored_hash):
+    """True if the stored hash is legacy SHA-256 or uses another KDF setting"""
+    if _is_legacy(stored_hash):
+        return True
+    method = _method()
+    params = stored_hash.split('$', 1)[0]
+    return not (params == method or params.startswith(method + ':'))
+
+def verify_password(stored_hash, password):
+    """Return (matches, needs_rehash) for a stored hash"""
+    if not stored_hash or password is None:
+        return False, False
+    ok = _run_in_pool(_verify, stored_hash, password)
+    return ok, ok and needs_rehash(stored_hash)
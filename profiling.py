@@ -0,0 +1,310 @@
+"""Opt-in sampling profiler for single requests and Socket.IO events.
+
+A request is profiled when an admin (User.is_admin) sends the
+``X-Profile: 1`` header or ``?_profile=1``, or when it falls into the
+PROFILE_SAMPLE_RATE fraction of traffic. Socket.IO events are profiled when
+their payload carries ``"_profile": true`` from an admin, or by sampling.
+
+While a profile is active a native background thread samples the handling
+thread's stack every PROFILE_INTERVAL seconds, and every SQL statement is
+recorded with its offset and duration. Under eventlet every greenlet shares
+one OS thread, so the sampler follows the profiled greenlet instead. A
+greenlet switch hook records which greenlet is running. While the profiled
+one runs, its live stack is sampled. While it is switched out, its saved
+frame is sampled, which shows where the request is waiting. Each profile is
+written to PROFILE_DIR as:
+
+- ``<id>.folded``: collapsed stacks ("a;b;c 12"), ready for flamegraph.pl
+  or speedscope
+- ``<id>.json``: metadata and the SQL timeline
+
+Admins can list and download profiles from /admin/profiles.
+"""
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from flask import Blueprint, abort, current_app, g, has_app_context, jsonify, request, send_file
+from sqlalchemy import event
+
+from models import db
+from user_context import current_user
+
+def _native_threading():
+    """The real threading module, even when eventlet has monkey-patched it"""
+    try:
+        from eventlet import patcher
+        return patcher.original('threading')
+    except ImportError:
+        import threading
+        return threading
+
+def _eventlet_patched():
+    try:
+        from eventlet import patcher
+    except ImportError:
+        return False
+    return patcher.is_monkey_patched('thread')
+
+class GreenletTracker:
+    """Which greenlet each OS thread is running, kept by a greenlet switch hook.
+
+    The hook is only installed on a thread while a profile started there is
+    active, and it chains to any trace function that was already set.
+    """
+
+    def __init__(self):
+        self.running = {}
+        self._installed = {}
+
+    def acquire(self):
+        """Track the calling thread; returns its native id"""
+        import greenlet
+
+        thread_id = _native_threading().get_ident()
+        state = self._installed.get(thread_id)
+        if state is None:
+            state = self._installed[thread_id] = [0, greenlet.settrace(self._on_switch)]
+        state[0] += 1
+        self.running[thread_id] = greenlet.getcurrent()
+        return thread_id
+
+    def release(self, thread_id):
+        import greenlet
+
+        state = self._installed[thread_id]
+        state[0] -= 1
+        if not state[0]:
+            greenlet.settrace(state[1])
+            del self._installed[thread_id]
+            self.running.pop(thread_id, None)
+
+    def _on_switch(self, event, args):
+        thread_id = _native_threading().get_ident()
+        if event in ('switch', 'throw'):
+            self.running[thread_id] = args[1]
+        state = self._installed.get(thread_id)
+        if state is not None and state[1] is not None:
+            state[1](event, args)
+
+greenlet_tracker = GreenletTracker()
+
+class StackSampler:
+    """Samples one thread's (or one greenlet's) Python stack from a native background thread"""
+
+    def __init__(self, thread_id, interval, greenlet=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.greenlet = greenlet
+        self.stacks = Counter()
+        self.samples = 0
+        self._threading = _native_threading()
+        self._stop = self._threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = self._threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+    def _frame(self):
+        if self.greenlet is None:
+            return sys._current_frames().get(self.thread_id)
+        if self.greenlet.dead:
+            return None
+        if greenlet_tracker.running.get(self.thread_id) is self.greenlet:
+            return sys._current_frames().get(self.thread_id)
+        # Switched out: its saved frame shows where it is waiting
+        return self.greenlet.gr_frame
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = self._frame()
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+class Profile:
+    """One profiled request or event"""
+
+    def __init__(self, kind, name, interval):
+        self.id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.kind = kind
+        self.name = name
+        self.started_at = datetime.utcnow()
+        self.sql = []
+        self._start = time.perf_counter()
+        self.duration = None
+        if _eventlet_patched():
+            import greenlet
+
+            self.sampler = StackSampler(greenlet_tracker.acquire(), interval, greenlet.getcurrent())
+        else:
+            self.sampler = StackSampler(_native_threading().get_ident(), interval)
+        self.sampler.start()
+
+    def record_sql(self, statement, started, elapsed):
+        self.sql.append({
+            'offset_ms': round((started - self._start) * 1000, 3),
+            'duration_ms': round(elapsed * 1000, 3),
+            'statement': ' '.join(statement.split())
+        })
+
+    def finish(self, directory):
+        self.duration = time.perf_counter() - self._start
+        stacks = self.sampler.stop()
+        if self.sampler.greenlet is not None:
+            greenlet_tracker.release(self.sampler.thread_id)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f'{self.id}.folded'), 'w') as fh:
+            for stack, count in stacks.most_common():
+                fh.write(f'{stack} {count}\n')
+        with open(os.path.join(directory, f'{self.id}.json'), 'w') as fh:
+            json.dump(self.to_dict(), fh, indent=2)
+        return self.id
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'name': self.name,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': round(self.duration * 1000, 3) if self.duration is not None else None,
+            'samples': self.sampler.samples,
+            'sql_statements': len(self.sql),
+            'sql_ms': round(sum(q['duration_ms'] for q in self.sql), 3),
+            'sql': self.sql
+        }
+
+def profile_dir():
+    return current_app.config.get('PROFILE_DIR') or os.path.join(current_app.instance_path, 'profiles')
+
+def is_admin():
+    """True if the logged-in user is an admin"""
+    user = current_user()
+    return bool(user and user.is_admin)
+
+def _sampled():
+    rate = current_app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+    return rate > 0 and random.random() < rate
+
+def start_profile(kind, name, requested):
+    """Start profiling the current request/event if asked for or sampled"""
+    if not current_app.config.get('PROFILING_ENABLED', True):
+        return None
+    if not (_sampled() or (requested and is_admin())):
+        return None
+    g._profile = Profile(kind, name, current_app.config.get('PROFILE_INTERVAL', 0.001))
+    return g._profile
+
+def finish_profile():
+    """Stop the active profile, write it out and return its id"""
+    profile = g.pop('_profile', None)
+    if profile is None:
+        return None
+    profile_id = profile.finish(profile_dir())
+    _prune(profile_dir(), current_app.config.get('PROFILE_MAX_FILES', 200))
+    return profile_id
+
+def _prune(directory, keep):
+    metas = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+    for name in metas[:-keep] if keep else []:
+        base = name[:-len('.json')]
+        for suffix in ('.json', '.folded'):
+            try:
+                os.remove(os.path.join(directory, base + suffix))
+            except FileNotFoundError:
+                pass
+
+def _profile_requested():
+    return request.headers.get('X-Profile') == '1' or request.args.get('_profile') == '1'
+
+def _before_request():
+    if request.endpoint and request.endpoint.startswith('profiling.'):
+        return
+    rule = request.url_rule.rule if request.url_rule is not None else request.path
+    start_profile('http', f'{request.method} {rule}', _profile_requested())
+
+def _after_request(response):
+    profile_id = finish_profile()
+    if profile_id:
+        response.headers['X-Profile-Id'] = profile_id
+    return response
+
+def _teardown_request(exc):
+    # Make sure the sampler thread stops even if after_request never ran
+    if g.get('_profile') is not None:
+        finish_profile()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and has_app_context() and g.get('_profile') is not None:
+        context._profile_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_profile_start', None)
+    if start is None:
+        return
+    profile = g.get('_profile') if has_app_context() else None
+    if profile is not None:
+        profile.record_sql(statement, start, time.perf_counter() - start)
+
+profiling_bp = Blueprint('profiling', __name__, url_prefix='/admin/profiles')
+
+@profiling_bp.before_request
+def _require_admin():
+    if not is_admin():
+        abort(403)
+
+@profiling_bp.route('')
+def list_profiles():
+    directory = profile_dir()
+    profiles = []
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory), reverse=True):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(directory, name)) as fh:
+                meta = json.load(fh)
+            meta.pop('sql', None)
+            profiles.append(meta)
+    return jsonify(profiles)
+
+@profiling_bp.route('/<profile_id>')
+def download_profile(profile_id):
+    # Profile ids are generated here; reject anything that could escape the directory
+    if not all(c.isalnum() or c == '-' for c in profile_id):
+        abort(404)
+    suffix = '.json' if request.args.get('format') == 'json' else '.folded'
+    path = os.path.join(profile_dir(), profile_id + suffix)
+    if not os.path.exists(path):
+        abort(404)
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=profile_id + suffix)
+
+def init_app(app):
+    """Install profiling hooks and the admin endpoints"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.register_blueprint(profiling_bp)
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
@@ -0,0 +1,262 @@
+"""Next-challenge recommendations from a per-user skill vector.
+
+Every user has one user_skills row. It holds a skill estimate in [0, 1] per
+challenge category, a bitmap of completed levels and the highest level
+reached. Each saved GameProgress updates the row in place with an
+Elo-style step, so nothing is recomputed from history:
+
+    expected    = 1 / (1 + exp(-SLOPE * (skill[category] - difficulty)))
+    performance = score ratio, lowered by slow times and extra attempts
+    skill[category] += LEARNING_RATE * (performance - expected)
+
+Beating a hard challenge raises the skill a lot. Struggling with an easy
+one lowers it.
+
+Every worker keeps a challenge feature matrix built from the in-memory
+catalog: category index, difficulty in [0, 1] and level for each active
+challenge. It is rebuilt only when the catalog version changes. The next
+best challenge is the uncompleted one nearest to the user's target
+point, which is a little harder than their skill in that category
+(STRETCH) and close to the level after the highest one reached. All
+challenges are scored in one vectorized pass, which takes microseconds
+for catalogs of this size.
+
+    GET /recommendations?limit=3
+    flask --app "app:create_app()" backfill-skills
+"""
+import itertools
+import math
+import threading
+
+from flask import Blueprint, current_app, jsonify, request, session
+
+from catalog import catalog
+from db_routing import read_only
+from models import db, GameProgress, UserSkill
+from pagination import parse_limit
+
+CATEGORIES = ('python', 'html', 'css', 'javascript', 'flask', 'other')
+DIFFICULTIES = {'beginner': 0.0, 'intermediate': 0.5, 'advanced': 1.0}
+TARGET_SECONDS = {'beginner': 120, 'intermediate': 300, 'advanced': 600}
+
+LEARNING_RATE = 0.15
+SLOPE = 4.0
+STRETCH = 0.15
+LEVEL_WEIGHT = 0.5
+DEFAULT_LIMIT = 3
+DEFAULT_CHUNK_SIZE = 10000
+
+_CATEGORY_INDEX = {name: index for index, name in enumerate(CATEGORIES)}
+
+def category_index(category):
+    return _CATEGORY_INDEX.get(category, _CATEGORY_INDEX['other'])
+
+def performance(entry, score, time_taken, attempts):
+    """How well a result went, in [0, 1]"""
+    points = entry.payload.get('points') or 0
+    ratio = min(max((score or 0) / points, 0.0), 1.0) if points else 1.0
+    target = TARGET_SECONDS.get(entry.payload.get('difficulty'), TARGET_SECONDS['beginner'])
+    speed = min(1.0, target / time_taken) if time_taken and time_taken > 0 else 1.0
+    return ratio * math.sqrt(speed) / math.sqrt(max(attempts or 1, 1))
+
+def valid_level(level):
+    """level as an int when it is a catalog level, else None"""
+    try:
+        level = int(level)
+    except (TypeError, ValueError):
+        return None
+    # The completed bitmap grows with the level, so cap it at the catalog
+    return level if 0 <= level <= catalog.highest_level() else None
+
+class SkillState:
+    """Decoded user_skills row"""
+    __slots__ = ('skills', 'completed', 'max_level', 'results')
+
+    def __init__(self, row=None):
+        import numpy as np
+
+        if row is None:
+            self.skills = np.zeros(len(CATEGORIES), dtype=np.float32)
+            self.completed = bytearray()
+            self.max_level = 0
+            self.results = 0
+        else:
+            self.skills = np.frombuffer(row.skills, dtype=np.float32).copy()
+            self.completed = bytearray(row.completed_levels or b'')
+            self.max_level = row.max_level
+            self.results = row.results
+
+    def apply(self, level, entry, score, time_taken, attempts):
+        """Fold one saved result into the state"""
+        level = valid_level(level)
+        if level is not None:
+            byte, bit = divmod(level, 8)
+            if len(self.completed) <= byte:
+                self.completed.extend(bytes(byte + 1 - len(self.completed)))
+            self.completed[byte] |= 1 << bit
+            self.max_level = max(self.max_level, level)
+        self.results += 1
+        if entry is None:
+            return
+        index = category_index(entry.category)
+        difficulty = DIFFICULTIES.get(entry.payload.get('difficulty'), 0.0)
+        expected = 1.0 / (1.0 + math.exp(-SLOPE * (float(self.skills[index]) - difficulty)))
+        step = LEARNING_RATE * (performance(entry, score, time_taken, attempts) - expected)
+        self.skills[index] = min(max(self.skills[index] + step, 0.0), 1.0)
+
+    def columns(self):
+        return {'skills': self.skills.tobytes(), 'completed_levels': bytes(self.completed),
+                'max_level': self.max_level, 'results': self.results}
+
+    def store(self, row):
+        for key, value in self.columns().items():
+            setattr(row, key, value)
+
+    def completed_mask(self, levels):
+        """Boolean array: is each of levels completed"""
+        import numpy as np
+
+        bits = np.unpackbits(np.frombuffer(bytes(self.completed), dtype=np.uint8), bitorder='little')
+        inside = (levels >= 0) & (levels < len(bits))
+        mask = np.zeros(len(levels), dtype=bool)
+        mask[inside] = bits[levels[inside]].astype(bool)
+        return mask
+
+    def to_dict(self):
+        return {name: round(float(value), 3) for name, value in zip(CATEGORIES, self.skills)}
+
+def _ensure_row(user_id):
+    """Insert an empty user_skills row unless one exists"""
+    table = UserSkill.__table__
+    row = dict(SkillState().columns(), user_id=user_id)
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        insert = None
+
+    if insert is not None:
+        db.session.execute(insert(table).on_conflict_do_nothing(index_elements=[table.c.user_id]), [row])
+    elif db.session.get(UserSkill, user_id) is None:
+        db.session.execute(table.insert(), [row])
+
+def record_result(user_id, level, score, time_taken, attempts):
+    """Update a user's skill row for one save (caller commits).
+
+    Runs in a savepoint, so a failure is logged and leaves the caller's
+    transaction, and the save in it, intact.
+    """
+    level = valid_level(level)
+    try:
+        with db.session.begin_nested():
+            _ensure_row(user_id)
+            # Locked (where supported) so concurrent saves do not lose updates
+            row = db.session.get(UserSkill, user_id, with_for_update=True, populate_existing=True)
+            state = SkillState(row)
+            state.apply(level, catalog.for_level(level), score, time_taken, attempts)
+            state.store(row)
+    except Exception:
+        current_app.logger.exception('Skill update failed for user %s', user_id)
+
+class ChallengeIndex:
+    """Feature matrix of the active catalog, rebuilt per catalog version"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self.entries = []
+        self.levels = self.categories = self.difficulties = None
+        self.level_span = 1.0
+
+    def refresh(self):
+        version = catalog.version
+        if version == self._version:
+            return
+        import numpy as np
+
+        with self._lock:
+            if version == self._version:
+                return
+            entries = catalog.active()
+            self.levels = np.array([entry.level for entry in entries], dtype=np.int64)
+            self.categories = np.array([category_index(entry.category) for entry in entries], dtype=np.int64)
+            self.difficulties = np.array([DIFFICULTIES.get(entry.payload.get('difficulty'), 0.0)
+                                          for entry in entries], dtype=np.float32)
+            self.level_span = float(max(self.levels.max() - self.levels.min(), 1)) if entries else 1.0
+            self.entries = entries
+            self._version = version
+
+    def nearest(self, state, limit):
+        """[(entry, distance)] of the closest uncompleted challenges"""
+        import numpy as np
+
+        self.refresh()
+        if not self.entries:
+            return []
+        target = state.skills[self.categories] + STRETCH
+        distance = (self.difficulties - target) ** 2 \
+            + LEVEL_WEIGHT * ((self.levels - state.max_level - 1) / self.level_span) ** 2
+        distance[state.completed_mask(self.levels)] = np.inf
+        limit = min(limit, len(distance))
+        best = np.argpartition(distance, limit - 1)[:limit]
+        best = best[np.argsort(distance[best])]
+        return [(self.entries[i], float(distance[i])) for i in best if np.isfinite(distance[i])]
+
+challenge_index = ChallengeIndex()
+
+def recommend(user_id, limit=DEFAULT_LIMIT):
+    """(SkillState, [(entry, distance)]) for a user"""
+    row = db.session.get(UserSkill, user_id)
+    state = SkillState(row)
+    return state, challenge_index.nearest(state, limit)
+
+def rebuild(chunk_size=DEFAULT_CHUNK_SIZE):
+    """Replay all game_progress into user_skills; returns the rows scanned.
+
+    Archived progress is replayed first, from its partitions, so users keep
+    the skill built up by rows moved out by archive-data. Saves committed
+    while this runs may be missed, so run it when the app is quiet.
+    """
+    from archive import archived_chunks
+
+    states = {}
+    scanned = 0
+    archived = archived_chunks('game_progress', ('user_id', 'level', 'score', 'time_taken', 'attempts'),
+                               chunk_size)
+    result = db.session.execute(
+        db.select(GameProgress.user_id, GameProgress.level, GameProgress.score,
+                  GameProgress.time_taken, GameProgress.attempts).order_by(GameProgress.id),
+        execution_options={'stream_results': True, 'yield_per': chunk_size})
+    for user_id, level, score, time_taken, attempts in itertools.chain(
+            itertools.chain.from_iterable(archived), result):
+        state = states.get(user_id)
+        if state is None:
+            state = states[user_id] = SkillState()
+        level = valid_level(level)
+        state.apply(level, catalog.for_level(level), score, time_taken, attempts)
+        scanned += 1
+
+    db.session.query(UserSkill).delete()
+    db.session.bulk_insert_mappings(UserSkill, [dict(state.columns(), user_id=user_id)
+                                                for user_id, state in states.items()])
+    db.session.commit()
+    return scanned
+
+recommender_bp = Blueprint('recommender', __name__, url_prefix='/recommendations')
+
+@recommender_bp.route('')
+@read_only
+def recommendations():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    state, nearest = recommend(session['user_id'], parse_limit(request.args.get('limit'), DEFAULT_LIMIT))
+    return jsonify({
+        'skills': state.to_dict(),
+        'recommendations': [dict(entry.payload, distance=round(distance, 4)) for entry, distance in nearest]
+    })
+
+def init_app(app):
+    """Register the recommendation endpoint"""
+    app.register_blueprint(recommender_bp)
@@ -0,0 +1,102 @@
+"""Cache of rendered pages, keyed by theme and catalog version.
+
+Lesson and challenge pages depend only on their topic or level, the
+theme and the challenge catalog. They are rendered once per key and kept
+in a bounded LRU together with pre-compressed gzip (and brotli, if the
+``brotli`` package is installed) variants. Each encoding is served with
+its own ETag. Later requests are answered without running Jinja or
+touching the database. A client that sends a matching If-None-Match gets
+a 304.
+
+Pages are rendered fresh, and not cached, while the session holds flashed
+messages, so one-off notices are never stored in a shared entry.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import current_app, make_response, request, session
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+DEFAULT_SIZE = 512
+
+class CachedPage:
+    __slots__ = ('etag', 'identity', 'gzip', 'br', 'mimetype')
+
+    def __init__(self, body, mimetype='text/html'):
+        self.identity = body
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+        self.gzip = gzip.compress(body, compresslevel=9)
+        self.br = brotli.compress(body) if brotli is not None else None
+        self.mimetype = mimetype
+
+class RenderCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            page = self._entries.get(key)
+            if page is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return page
+
+    def put(self, key, page, size):
+        with self._lock:
+            self._entries[key] = page
+            self._entries.move_to_end(key)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+render_cache = RenderCache()
+
+def _respond(page):
+    accepted = request.accept_encodings
+    if page.br is not None and accepted['br']:
+        body, encoding = page.br, 'br'
+    elif accepted['gzip']:
+        body, encoding = page.gzip, 'gzip'
+    else:
+        body, encoding = page.identity, 'identity'
+    # Each encoding is a different representation, so it needs its own strong ETag
+    etag = f'{page.etag}-{encoding}'
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(body)
+        response.mimetype = page.mimetype
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding, Cookie'
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def cached_page(key, render):
+    """Serve the page for key from the cache, calling render() on a miss.
+
+    key must include everything the page depends on (template, topic or
+    level, theme, catalog version); render returns the HTML string.
+    """
+    if not current_app.config.get('RENDER_CACHE_ENABLED', True) or session.get('_flashes'):
+        return render()
+    page = render_cache.get(key)
+    if page is None:
+        page = CachedPage(render().encode('utf-8'))
+        render_cache.put(key, page, current_app.config.get('RENDER_CACHE_SIZE', DEFAULT_SIZE))
+    return _respond(page)
@@ -0,0 +1,56 @@
+"""Move rows past their retention period into the monthly archive.
+
+    pathfinder-archive --vacuum
+    flask --app "app:create_app()" archive-data --table code_submissions --days 90
+
+Safe to re-run: each chunk is deleted only after it has been archived.
+"""
+import argparse
+import sys
+import time
+
+import click
+from flask.cli import with_appcontext
+
+from archive import DEFAULT_CHUNK_SIZE, POLICIES, archive_table, vacuum
+
+def _run(tables, days, chunk_size, run_vacuum, echo):
+    start = time.perf_counter()
+    for name in tables:
+        report = archive_table(name, days, chunk_size)
+        partitions = ', '.join(sorted(report.partitions)) or 'none'
+        echo(f'{name}: {report.archived} rows archived (partitions: {partitions})')
+    if run_vacuum:
+        vacuum()
+    echo(f'Done in {time.perf_counter() - start:.2f}s')
+
+@click.command('archive-data')
+@click.option('--table', 'tables', multiple=True, type=click.Choice(sorted(POLICIES)),
+              help='Table to archive (default: all)')
+@click.option('--days', type=int, default=None, help='Override the configured retention period')
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True)
+@click.option('--vacuum', 'run_vacuum', is_flag=True, help='Reclaim freed space afterwards (SQLite)')
+@with_appcontext
+def archive_data_command(tables, days, chunk_size, run_vacuum):
+    """Archive rows older than the retention period"""
+    _run(tables or sorted(POLICIES), days, chunk_size, run_vacuum, click.echo)
+
+def main(argv=None):
+    """Console entry point for ``pathfinder-archive``"""
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Archive rows older than the retention period.')
+    parser.add_argument('--config', default=None, help='Config name (development, production, testing)')
+    parser.add_argument('--table', dest='tables', action='append', choices=sorted(POLICIES))
+    parser.add_argument('--days', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--vacuum', action='store_true')
+    args = parser.parse_args(argv)
+
+    app = create_app(args.config)
+    with app.app_context():
+        _run(args.tables or sorted(POLICIES), args.days, args.chunk_size, args.vacuum, print)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""Rebuild the per-level and per-challenge analytics histograms.
+
+    pathfinder-backfill-analytics
+    flask --app "app:create_app()" backfill-analytics --chunk-size 100000
+"""
+import argparse
+import sys
+import time
+
+import click
+from flask.cli import with_appcontext
+
+from analytics import DEFAULT_CHUNK_SIZE, backfill
+
+@click.command('backfill-analytics')
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True)
+@with_appcontext
+def backfill_analytics_command(chunk_size):
+    """Recompute analytics histograms from game_progress"""
+    start = time.perf_counter()
+    scanned = backfill(chunk_size)
+    click.echo(f'{scanned} progress rows scanned in {time.perf_counter() - start:.2f}s')
+
+def main(argv=None):
+    """Console entry point for ``pathfinder-backfill-analytics``"""
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Rebuild analytics histograms.')
+    parser.add_argument('--config', default=None, help='Config name (development, production, testing)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    app = create_app(args.config)
+    start = time.perf_counter()
+    with app.app_context():
+        scanned = backfill(args.chunk_size)
+    print(f'{scanned} progress rows scanned in {time.perf_counter() - start:.2f}s')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
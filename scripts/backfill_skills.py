@@ -0,0 +1,41 @@
+"""Rebuild every user's recommendation skill vector from game_progress.
+
+    pathfinder-backfill-skills
+    flask --app "app:create_app()" backfill-skills --chunk-size 50000
+"""
+import argparse
+import sys
+import time
+
+import click
+from flask.cli import with_appcontext
+
+from recommender import DEFAULT_CHUNK_SIZE, rebuild
+
+@click.command('backfill-skills')
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True)
+@with_appcontext
+def backfill_skills_command(chunk_size):
+    """Recompute user skill vectors from game_progress"""
+    start = time.perf_counter()
+    scanned = rebuild(chunk_size)
+    click.echo(f'{scanned} progress rows replayed in {time.perf_counter() - start:.2f}s')
+
+def main(argv=None):
+    """Console entry point for ``pathfinder-backfill-skills``"""
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Rebuild recommendation skill vectors.')
+    parser.add_argument('--config', default=None, help='Config name (development, production, testing)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    app = create_app(args.config)
+    start = time.perf_counter()
+    with app.app_context():
+        scanned = rebuild(args.chunk_size)
+    print(f'{scanned} progress rows replayed in {time.perf_counter() - start:.2f}s')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Benchmark the row-tuple serializers against the ORM to_dict() path.
+
+Seeds a scratch database and serializes every GameProgress, User and
+Leaderboard row three ways: hydrated ORM objects with to_dict() plus
+json.dumps, projected tuples through a RowEncoder plus json.dumps, and the
+chunked iter_json_array() generator behind stream_json(). It reports the
+time and peak traced memory for each, and checks that all three produce
+the same JSON:
+
+    python -m scripts.bench_serialization --users 5000 --levels 10
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from scripts.benchmark import make_app, seed
+
+def _measure(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+def compare_paths(name, orm_query, encoder, projected_query, chunk_size, repeat):
+    """Time to_dict(), RowEncoder and streaming for one payload shape"""
+    from models import db
+    from serializers import iter_json_array
+
+    def orm():
+        db.session.expunge_all()
+        return json.dumps([obj.to_dict() for obj in orm_query()], separators=(',', ':'))
+
+    def rows():
+        return json.dumps(encoder.encode_all(projected_query().all()), separators=(',', ':'))
+
+    def streamed():
+        return ''.join(iter_json_array(projected_query().yield_per(chunk_size), encoder, chunk_size))
+
+    results = {}
+    outputs = {}
+    for label, func in (('to_dict', orm), ('row_encoder', rows), ('stream', streamed)):
+        outputs[label], seconds, peak = _measure(func, repeat)
+        results[label] = {'seconds': round(seconds, 4), 'peak_kb': round(peak / 1024, 1)}
+    row_count = len(json.loads(outputs['to_dict']))
+    for label in results:
+        results[label]['rows_per_sec'] = round(row_count / results[label]['seconds']) if results[label]['seconds'] else None
+    same = json.loads(outputs['to_dict']) == json.loads(outputs['row_encoder']) == json.loads(outputs['stream'])
+    return {'payload': name, 'rows': row_count, 'identical_output': same, 'paths': results}
+
+def run(users=2000, levels=10, chunk_size=1000, repeat=3, app_factory=make_app):
+    from models import User, GameProgress, Leaderboard
+    from serializers import GAME_PROGRESS, LEADERBOARD, USER, RowEncoder
+
+    # Leaderboard.to_dict() also carries last_updated, which the API omits
+    leaderboard = RowEncoder('leaderboard_to_dict', *LEADERBOARD.columns, Leaderboard.last_updated)
+
+    workdir = tempfile.mkdtemp(prefix='pathfinder-serial-')
+    try:
+        app = app_factory(os.path.join(workdir, 'serial.db'))
+        seed(app, users, levels, challenges=10)
+        with app.app_context():
+            order = lambda query, *columns: query.order_by(*columns)
+            return [
+                compare_paths('game_progress',
+                              lambda: order(GameProgress.query, GameProgress.id).all(),
+                              GAME_PROGRESS, lambda: order(GAME_PROGRESS.query(), GameProgress.id),
+                              chunk_size, repeat),
+                compare_paths('user',
+                              lambda: order(User.query, User.id).all(),
+                              USER, lambda: order(USER.query(), User.id),
+                              chunk_size, repeat),
+                compare_paths('leaderboard',
+                              lambda: order(Leaderboard.query, Leaderboard.id).all(),
+                              leaderboard,
+                              lambda: order(leaderboard.query().join(User, User.id == Leaderboard.user_id),
+                                            Leaderboard.id),
+                              chunk_size, repeat),
+            ]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def print_report(results):
+    print(f"{'payload':15} {'rows':>7} {'path':12} {'seconds':>9} {'rows/s':>10} {'peak KB':>10}")
+    for result in results:
+        for label, stats in result['paths'].items():
+            print(f"{result['payload']:15} {result['rows']:7} {label:12} {stats['seconds']:9.4f} "
+                  f"{stats['rows_per_sec'] or 0:10} {stats['peak_kb']:10.1f}")
+        if not result['identical_output']:
+            print(f"  WARNING: {result['payload']} outputs differ between paths")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark row-tuple serialization against to_dict().')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--levels', type=int, default=10)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    args = parser.parse_args(argv)
+
+    results = run(args.users, args.levels, args.chunk_size, args.repeat)
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+    return 0 if all(result['identical_output'] for result in results) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
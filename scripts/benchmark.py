@@ -0,0 +1,280 @@
+"""Local load test for the hot HTTP routes and Socket.IO flows.
+
+Seeds a throwaway SQLite database in bulk, then drives the app with many
+concurrent simulated clients (one thread, Flask test client and Socket.IO
+test client each) and reports throughput and p50/p95/p99 latency per
+operation:
+
+    python -m scripts.benchmark --users 2000 --clients 16 --iterations 50 \\
+        --output bench.json
+
+Latency depends on the machine, so no baseline is committed. Record one
+on the machine that will run the comparison, then compare later runs
+against it:
+
+    python -m scripts.benchmark --save-baseline bench-baseline.json
+    python -m scripts.benchmark --baseline bench-baseline.json
+
+With --baseline, the run fails (exit code 1) if any operation's p95
+latency grows, or its throughput drops, by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from config import Config
+
+BENCH_PASSWORD = 'benchmark-password'
+
+# The page templates ship with the deployment, not this repository, so the
+# harness renders these stand-ins for any template the app cannot find
+STUB_TEMPLATES = ('index.html', 'login.html', 'register.html', 'dashboard.html', 'game.html',
+                  'multiplayer.html', 'lessons.html', '404.html', '500.html')
+STUB_TEMPLATE_SOURCE = ('<html><body>{{ theme }} {{ username }} {{ stats }} {{ challenge }} '
+                        '{{ challenges }} {{ lesson }}</body></html>')
+
+class BenchmarkConfig(Config):
+    TESTING = True
+    METRICS_ENABLED = True
+    PROFILE_SAMPLE_RATE = 0.0
+
+def make_app(db_path):
+    from jinja2 import ChoiceLoader, DictLoader
+
+    from app import create_app
+    from user_context import user_cache
+
+    # Each run gets a fresh database, so drop users cached by a previous one
+    user_cache.clear()
+
+    config = type('RunConfig', (BenchmarkConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'CATALOG_VERSION_FILE': db_path + '.catalog_version'
+    })
+    app = create_app(config)
+    app.jinja_loader = ChoiceLoader([
+        app.jinja_loader, DictLoader(dict.fromkeys(STUB_TEMPLATES, STUB_TEMPLATE_SOURCE))])
+    return app
+
+def seed(app, users, levels, challenges):
+    """Bulk-insert users, stats, leaderboard rows, challenges and progress"""
+    from models import db, User, MultiplayerStats, Leaderboard, Challenge, GameProgress
+    from passwords import hash_password
+    from scripts.init_db import init_database
+
+    rng = random.Random(42)
+    with app.app_context():
+        init_database(seed=True)
+        # Hash once and share it; bulk mappings skip the model validators
+        password_hash = hash_password(BENCH_PASSWORD)
+        db.session.bulk_insert_mappings(User, [{
+            'id': i, 'username': f'bench{i}', 'email': f'bench{i}@example.com',
+            'username_lower': f'bench{i}', 'email_lower': f'bench{i}@example.com',
+            'password_hash': password_hash, 'theme_preference': 'cute'
+        } for i in range(1, users + 1)])
+        db.session.bulk_insert_mappings(MultiplayerStats, [
+            {'user_id': i, 'rating': 1000 + rng.randint(-200, 200)} for i in range(1, users + 1)])
+        db.session.bulk_insert_mappings(Challenge, [{
+            'level': 100 + i, 'title': f'Benchmark challenge {i}', 'description': 'Generated',
+            'category': rng.choice(('python', 'html', 'css')), 'points': 100
+        } for i in range(challenges)])
+        progress = []
+        for user_id in range(1, users + 1):
+            for level in range(1, rng.randint(1, levels) + 1):
+                progress.append({
+                    'user_id': user_id, 'level': level, 'score': rng.randint(0, 150),
+                    'time_taken': rng.randint(10, 900), 'attempts': rng.randint(1, 5)
+                })
+        db.session.bulk_insert_mappings(GameProgress, progress)
+        db.session.bulk_insert_mappings(Leaderboard, [{
+            'user_id': i, 'total_score': rng.randint(0, 5000), 'levels_completed': rng.randint(0, levels)
+        } for i in range(1, users + 1)])
+        db.session.commit()
+    return len(progress)
+
+class Recorder:
+    """Collects latencies per operation from all client threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def timed(self, name, func):
+        start = time.perf_counter()
+        try:
+            ok = func()
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies.setdefault(name, []).append(elapsed)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+def run_client(app, socketio, recorder, client_id, users, iterations):
+    rng = random.Random(client_id)
+    user_id = rng.randint(1, users)
+    client = app.test_client()
+
+    def login():
+        r = client.post('/login', data={'username': f'bench{user_id}', 'password': BENCH_PASSWORD})
+        return r.status_code == 302 and r.location.endswith('/dashboard')
+
+    recorder.timed('POST /login', login)
+    sio = socketio.test_client(app, flask_test_client=client)
+    room = None
+
+    for _ in range(iterations):
+        recorder.timed('GET /dashboard', lambda: client.get('/dashboard').status_code == 200)
+        recorder.timed('POST /save_progress', lambda: client.post('/save_progress', json={
+            'level': rng.randint(1, 10), 'score': rng.randint(0, 150),
+            'code_solution': 'print("hello")', 'time_taken': rng.randint(10, 900)
+        }).status_code == 200)
+        recorder.timed('GET /leaderboard', lambda: client.get('/leaderboard').status_code == 200)
+        recorder.timed('GET /user_stats', lambda: client.get('/user_stats').status_code == 200)
+
+        def create_room():
+            nonlocal room
+            sio.emit('create_room', {'username': f'bench{user_id}'})
+            created = [m for m in sio.get_received() if m['name'] == 'room_created']
+            if created:
+                room = created[-1]['args'][0]['roomId']
+            return bool(created)
+
+        recorder.timed('socket create_room', create_room)
+        recorder.timed('socket join_room', lambda: (
+            sio.emit('join_room', {'room': room, 'username': f'bench{user_id}'}),
+            bool(sio.get_received()))[1])
+        recorder.timed('socket challenge_submit', lambda: (
+            sio.emit('challenge_submit', {'room': room, 'username': f'bench{user_id}', 'code': 'x = 1'}),
+            bool(sio.get_received()))[1])
+    sio.disconnect()
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def summarize(recorder, wall_time):
+    operations = {}
+    for name, values in sorted(recorder.latencies.items()):
+        values.sort()
+        operations[name] = {
+            'count': len(values),
+            'errors': recorder.errors.get(name, 0),
+            'throughput': round(len(values) / wall_time, 2),
+            'mean_ms': round(sum(values) / len(values) * 1000, 3),
+            'p50_ms': round(percentile(values, 50) * 1000, 3),
+            'p95_ms': round(percentile(values, 95) * 1000, 3),
+            'p99_ms': round(percentile(values, 99) * 1000, 3)
+        }
+    return operations
+
+def compare(current, baseline, tolerance):
+    """Return a list of regression messages against a baseline result"""
+    regressions = []
+    for name, base in baseline.get('operations', {}).items():
+        now = current['operations'].get(name)
+        if now is None:
+            regressions.append(f'{name}: missing from this run')
+            continue
+        if now['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {now['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if now['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {now['throughput']}/s vs baseline {base['throughput']}/s")
+        if now['errors'] > base.get('errors', 0):
+            regressions.append(f"{name}: {now['errors']} errors vs baseline {base.get('errors', 0)}")
+    return regressions
+
+def run_benchmark(users=500, levels=10, challenges=200, clients=8, iterations=20, app_factory=make_app):
+    """Seed a scratch database, run the load and return the result dict"""
+    from app import socketio
+
+    workdir = tempfile.mkdtemp(prefix='pathfinder-bench-')
+    try:
+        app = app_factory(os.path.join(workdir, 'bench.db'))
+        seed_start = time.perf_counter()
+        progress_rows = seed(app, users, levels, challenges)
+        seed_time = time.perf_counter() - seed_start
+
+        recorder = Recorder()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            futures = [pool.submit(run_client, app, socketio, recorder, i, users, iterations)
+                       for i in range(clients)]
+            for future in futures:
+                future.result()
+        wall_time = time.perf_counter() - start
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'users': users, 'progress_rows': progress_rows, 'challenges': challenges,
+            'clients': clients, 'iterations': iterations,
+            'seed_seconds': round(seed_time, 3), 'wall_seconds': round(wall_time, 3)
+        },
+        'operations': summarize(recorder, wall_time)
+    }
+
+def print_report(result):
+    meta = result['meta']
+    print(f"{meta['clients']} clients x {meta['iterations']} iterations, "
+          f"{meta['users']} users / {meta['progress_rows']} progress rows "
+          f"(seeded in {meta['seed_seconds']}s, ran {meta['wall_seconds']}s)")
+    print(f"{'operation':28} {'count':>6} {'err':>4} {'req/s':>9} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, op in result['operations'].items():
+        print(f"{name:28} {op['count']:6} {op['errors']:4} {op['throughput']:9.1f} "
+              f"{op['p50_ms']:8.2f} {op['p95_ms']:8.2f} {op['p99_ms']:8.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the local load-test benchmark.')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--levels', type=int, default=10)
+    parser.add_argument('--challenges', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    parser.add_argument('--baseline', help='Compare against this baseline JSON')
+    parser.add_argument('--save-baseline', help='Write results as the new baseline to this path')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed relative regression before failing (default 0.25)')
+    args = parser.parse_args(argv)
+
+    if args.baseline and not os.path.exists(args.baseline):
+        parser.error(f'baseline {args.baseline} not found; record one first with --save-baseline')
+
+    result = run_benchmark(args.users, args.levels, args.challenges, args.clients, args.iterations)
+    print_report(result)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as fh:
+                json.dump(result, fh, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(result, json.load(fh), args.tolerance)
+        if regressions:
+            print('REGRESSIONS:')
+            for message in regressions:
+                print(f'  {message}')
+            return 1
+        print('No regressions against baseline.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
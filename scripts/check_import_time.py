@@ -0,0 +1,74 @@
+"""Check that importing the application stays within a startup budget.
+
+Runs ``python -X importtime -c "import app"`` in a fresh interpreter and
+fails if the cumulative import time of ``app`` exceeds the budget, or if
+the import touched the database file:
+
+    python -m scripts.check_import_time --budget-ms 1000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+DEFAULT_BUDGET_MS = 1000
+DEFAULT_MODULE = 'app'
+
+
+def measure_import_time(module=DEFAULT_MODULE, cwd=None, env=None):
+    """Return (cumulative_us, per_module) for importing a module in a subprocess"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=cwd, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'Importing {module} failed:\n{result.stderr}')
+    
+    per_module = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        try:
+            cumulative = int(parts[1].strip())
+        except ValueError:
+            continue  # header line
+        per_module[parts[2].strip()] = cumulative
+    
+    if module not in per_module:
+        raise RuntimeError(f'No importtime entry found for {module}')
+    return per_module[module], per_module
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float,
+                        default=float(os.environ.get('IMPORT_BUDGET_MS', DEFAULT_BUDGET_MS)))
+    parser.add_argument('--module', default=DEFAULT_MODULE)
+    parser.add_argument('--top', type=int, default=10, help='Show the N slowest imports')
+    args = parser.parse_args(argv)
+    
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, os.environ.get('PYTHONPATH', '')]))
+    # Import from an empty working directory so a stray database file is visible
+    with tempfile.TemporaryDirectory() as scratch:
+        total_us, per_module = measure_import_time(args.module, cwd=scratch, env=env)
+        created = os.listdir(scratch)
+    
+    print(f'import {args.module}: {total_us / 1000:.1f} ms (budget {args.budget_ms:.0f} ms)')
+    for name, cumulative in sorted(per_module.items(), key=lambda item: -item[1])[:args.top]:
+        print(f'  {cumulative / 1000:8.1f} ms  {name}')
+    
+    failed = False
+    if created:
+        print(f'FAIL: import created files: {", ".join(created)}')
+        failed = True
+    if total_us / 1000 > args.budget_ms:
+        print('FAIL: import time over budget')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
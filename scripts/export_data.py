@@ -0,0 +1,52 @@
+"""Export progress, submissions or matches to NDJSON/CSV (optionally gzip).
+
+    pathfinder-export progress progress.ndjson.gz
+    flask --app "app:create_app()" export-data submissions subs.csv --decrypt
+"""
+import argparse
+import sys
+import time
+
+import click
+from flask.cli import with_appcontext
+
+from data_transfer import DEFAULT_CHUNK_SIZE, FORMATS, TABLES, export_to_file, get_model
+
+@click.command('export-data')
+@click.argument('table', type=click.Choice(list(TABLES)))
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Defaults from the file name')
+@click.option('--gzip/--no-gzip', 'compress', default=None, help='Defaults to on for *.gz')
+@click.option('--decrypt', is_flag=True, help='Export code solutions in plain text')
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True)
+@with_appcontext
+def export_data_command(table, path, fmt, compress, decrypt, chunk_size):
+    """Stream a table to an export file"""
+    start = time.perf_counter()
+    count = export_to_file(get_model(table), path, fmt, compress, decrypt, chunk_size)
+    click.echo(f'{count} {table} rows written to {path} in {time.perf_counter() - start:.2f}s')
+
+def main(argv=None):
+    """Console entry point for ``pathfinder-export``"""
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Export a table to NDJSON or CSV.')
+    parser.add_argument('table', choices=list(TABLES))
+    parser.add_argument('path')
+    parser.add_argument('--config', default=None, help='Config name (development, production, testing)')
+    parser.add_argument('--format', dest='fmt', choices=FORMATS, default=None)
+    parser.add_argument('--gzip', dest='compress', action='store_true', default=None)
+    parser.add_argument('--decrypt', action='store_true')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    app = create_app(args.config)
+    start = time.perf_counter()
+    with app.app_context():
+        count = export_to_file(get_model(args.table), args.path, args.fmt, args.compress,
+                               args.decrypt, args.chunk_size)
+    print(f'{count} {args.table} rows written to {args.path} in {time.perf_counter() - start:.2f}s')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
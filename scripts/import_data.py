@@ -0,0 +1,63 @@
+"""Import an export file in batched, resumable transactions.
+
+    pathfinder-import progress progress.ndjson.gz
+    flask --app "app:create_app()" import-data submissions subs.csv --batch-size 5000
+
+If an import is interrupted, run the same command again and it resumes
+from the checkpoint file written next to the input.
+"""
+import argparse
+import sys
+
+import click
+from flask.cli import with_appcontext
+
+from data_transfer import DEFAULT_BATCH_SIZE, FORMATS, TABLES, TransferError, get_model, import_file
+
+def format_report(report):
+    """Return a one-line summary of an ImportReport"""
+    resumed = f' (resumed after {report.resumed_from})' if report.resumed_from else ''
+    return (f'{report.inserted} inserted, {report.skipped} already present in '
+            f'{report.batches} batches{resumed}, {report.elapsed:.2f}s '
+            f'({report.rows_per_sec:.0f} rows/sec)')
+
+@click.command('import-data')
+@click.argument('table', type=click.Choice(list(TABLES)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Defaults from the file name')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True)
+@click.option('--checkpoint', help='Checkpoint file (default: <path>.checkpoint)')
+@with_appcontext
+def import_data_command(table, path, fmt, batch_size, checkpoint):
+    """Bulk-load an export file into a table"""
+    try:
+        report = import_file(get_model(table), path, fmt, batch_size, checkpoint)
+    except TransferError as e:
+        raise click.ClickException(str(e))
+    click.echo(format_report(report))
+
+def main(argv=None):
+    """Console entry point for ``pathfinder-import``"""
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Import an NDJSON or CSV export.')
+    parser.add_argument('table', choices=list(TABLES))
+    parser.add_argument('path')
+    parser.add_argument('--config', default=None, help='Config name (development, production, testing)')
+    parser.add_argument('--format', dest='fmt', choices=FORMATS, default=None)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--checkpoint', default=None)
+    args = parser.parse_args(argv)
+
+    app = create_app(args.config)
+    try:
+        with app.app_context():
+            report = import_file(get_model(args.table), args.path, args.fmt, args.batch_size, args.checkpoint)
+    except TransferError as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 1
+    print(format_report(report))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
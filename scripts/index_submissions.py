@@ -0,0 +1,43 @@
+"""Fingerprint code submissions that are not in the similarity index yet.
+
+    pathfinder-index-submissions
+    flask --app "app:create_app()" index-submissions --chunk-size 1000
+
+Safe to re-run: only submissions without a fingerprint are processed.
+"""
+import argparse
+import sys
+import time
+
+import click
+from flask.cli import with_appcontext
+
+from similarity import DEFAULT_CHUNK_SIZE, index_pending
+
+@click.command('index-submissions')
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True)
+@with_appcontext
+def index_submissions_command(chunk_size):
+    """Add pending submissions to the similarity index"""
+    start = time.perf_counter()
+    indexed = index_pending(chunk_size)
+    click.echo(f'{indexed} submissions indexed in {time.perf_counter() - start:.2f}s')
+
+def main(argv=None):
+    """Console entry point for ``pathfinder-index-submissions``"""
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Index submissions for similarity search.')
+    parser.add_argument('--config', default=None, help='Config name (development, production, testing)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    app = create_app(args.config)
+    start = time.perf_counter()
+    with app.app_context():
+        indexed = index_pending(args.chunk_size)
+    print(f'{indexed} submissions indexed in {time.perf_counter() - start:.2f}s')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
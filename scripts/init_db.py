@@ -0,0 +1,62 @@
+"""Create the Python Pathfinder schema and seed sample data.
+
+Run once per deployment instead of on every application boot. The schema
+is built by the Alembic migrations, so an existing database is upgraded
+to the latest revision. A database created before the migrations existed
+(tables but no alembic_version) is first stamped with the initial revision:
+
+    pathfinder-init
+    flask --app "app:create_app()" init-db
+"""
+import argparse
+import sys
+
+import click
+from flask.cli import with_appcontext
+
+from models import db, create_sample_data
+
+# Schema that db.create_all() built before the migrations were added
+INITIAL_REVISION = '1bfede77f2a9'
+
+
+def init_database(seed=True):
+    """Migrate the schema to the latest revision and optionally insert the sample data"""
+    # Running the migrations (rather than create_all) records the alembic
+    # head, so later `flask db upgrade` runs apply cleanly
+    from flask_migrate import stamp, upgrade
+    tables = db.inspect(db.engine).get_table_names()
+    if 'users' in tables and 'alembic_version' not in tables:
+        stamp(revision=INITIAL_REVISION)
+    upgrade()
+    if seed:
+        create_sample_data()
+
+
+@click.command('init-db')
+@click.option('--no-seed', is_flag=True, help='Create tables without sample data.')
+@with_appcontext
+def init_db_command(no_seed):
+    """Create database tables and seed sample data"""
+    init_database(seed=not no_seed)
+    click.echo('Database initialized.')
+
+
+def main(argv=None):
+    """Console entry point for ``pathfinder-init``"""
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Create tables and seed sample data.')
+    parser.add_argument('--config', default=None, help='Config name (development, production, testing)')
+    parser.add_argument('--no-seed', action='store_true', help='Create tables without sample data')
+    args = parser.parse_args(argv)
+    
+    app = create_app(args.config)
+    with app.app_context():
+        init_database(seed=not args.no_seed)
+    print('Database initialized.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""Load a challenge pack (JSON Lines file, JSON file or directory).
+
+    pathfinder-load-challenges packs/python_basics.jsonl
+    flask --app "app:create_app()" load-challenges packs/
+"""
+import argparse
+import sys
+
+import click
+from flask.cli import with_appcontext
+
+from challenge_loader import DEFAULT_CHUNK_SIZE, load_challenge_pack
+
+def format_report(report):
+    """Return a one-line summary of a LoadReport"""
+    return (f'{report.inserted} inserted, {report.updated} updated, '
+            f'{report.unchanged} unchanged, {len(report.errors)} invalid '
+            f'in {report.elapsed:.2f}s ({report.rows_per_sec:.0f} rows/sec)')
+
+@click.command('load-challenges')
+@click.argument('path', type=click.Path(exists=True))
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True)
+@with_appcontext
+def load_challenges_command(path, chunk_size):
+    """Upsert challenges from a pack file or directory"""
+    report = load_challenge_pack(path, chunk_size=chunk_size)
+    for error in report.errors:
+        click.echo(f'skipped {error}', err=True)
+    click.echo(format_report(report))
+
+def main(argv=None):
+    """Console entry point for ``pathfinder-load-challenges``"""
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Load a challenge pack.')
+    parser.add_argument('path')
+    parser.add_argument('--config', default=None, help='Config name (development, production, testing)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    app = create_app(args.config)
+    with app.app_context():
+        report = load_challenge_pack(args.path, chunk_size=args.chunk_size)
+    for error in report.errors:
+        print(f'skipped {error}', file=sys.stderr)
+    print(format_report(report))
+    return 1 if report.errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
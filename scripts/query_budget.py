@@ -0,0 +1,266 @@
+"""Per-endpoint SQL query budgets.
+
+Drives every route and Socket.IO handler against a seeded database,
+records the SQL statements each one issues and the time spent in the
+database, and checks them against query_budgets.json:
+
+    python -m scripts.query_budget            # check
+    python -m scripts.query_budget --update   # re-record changed budgets
+
+Each endpoint is measured twice: first with every process-wide cache
+cleared (budgeted as "<endpoint> (cold)"), then again with the caches warm,
+so budgets cover both the miss path and steady state. Every endpoint is
+measured on a small and a large dataset (10 and 10,000 users by default),
+and the statement count must not grow with the data. That is how N+1
+patterns are caught. When a budget is exceeded, a diff of the recorded and
+the actual statements is printed. An endpoint that raises or returns a 5xx
+is reported as failed and the remaining endpoints are still measured.
+"""
+import argparse
+import difflib
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from scripts.benchmark import BENCH_PASSWORD, make_app, seed
+
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'query_budgets.json')
+SMALL_DATASET = 10
+LARGE_DATASET = 10000
+COLD = ' (cold)'
+
+def _http(method, path, **kwargs):
+    def call(ctx):
+        response = getattr(ctx.client, method)(path, **kwargs)
+        return response.status_code < 500
+    return call
+
+def _socket(event_name, payload):
+    def call(ctx):
+        ctx.sio.emit(event_name, dict(payload, room=ctx.room))
+        ctx.sio.get_received()
+        return True
+    return call
+
+ENDPOINTS = [
+    ('GET /', _http('get', '/')),
+    ('GET /login', _http('get', '/login')),
+    ('GET /register', _http('get', '/register')),
+    ('GET /dashboard', _http('get', '/dashboard')),
+    ('GET /game/<level>', _http('get', '/game/1')),
+    ('GET /multiplayer', _http('get', '/multiplayer')),
+    ('GET /lessons/<topic>', _http('get', '/lessons/python_basics')),
+    ('POST /save_progress', _http('post', '/save_progress', json={
+        'level': 1, 'score': 50, 'code_solution': 'x = 1', 'time_taken': 42})),
+    ('GET /leaderboard', _http('get', '/leaderboard')),
+    ('GET /user_stats', _http('get', '/user_stats')),
+    ('GET /matches', _http('get', '/matches')),
+    ('GET /analytics/levels', _http('get', '/analytics/levels')),
+    ('GET /recommendations', _http('get', '/recommendations')),
+    ('POST /update_theme', _http('post', '/update_theme', json={'theme': 'cute'})),
+    ('socket create_room', _socket('create_room', {'username': 'bench1'})),
+    ('socket join_room', _socket('join_room', {'username': 'bench1'})),
+    ('socket challenge_submit', _socket('challenge_submit', {'username': 'bench1', 'code': 'x = 1'})),
+    ('socket leave_room', _socket('leave_room', {'username': 'bench1'})),
+    ('POST /login', _http('post', '/login', data={'username': 'bench1', 'password': BENCH_PASSWORD})),
+]
+
+class StatementRecorder:
+    """Captures statements and DB time while active"""
+
+    def __init__(self, engines):
+        self.active = False
+        self.statements = []
+        self.seconds = 0.0
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before)
+            event.listen(engine, 'after_cursor_execute', self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active and context is not None:
+            context._budget_start = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_budget_start', None)
+        if self.active and start is not None:
+            self.statements.append(normalize(statement))
+            self.seconds += time.perf_counter() - start
+
+    def measure(self, func):
+        self.statements, self.seconds, self.active = [], 0.0, True
+        try:
+            ok = func()
+        finally:
+            self.active = False
+        return ok, list(self.statements), self.seconds
+
+def clear_caches():
+    """Drop every process-wide cache so the next call takes the miss path"""
+    from catalog import catalog
+    from render_cache import render_cache
+    from snapshots import leaderboard_snapshots
+    from user_context import user_cache
+
+    catalog.clear()
+    render_cache.clear()
+    leaderboard_snapshots.clear()
+    user_cache.clear()
+
+def normalize(statement):
+    """Collapse whitespace and variable-length IN lists for stable diffs"""
+    statement = ' '.join(statement.split())
+    return re.sub(r'\((?:\?, )+\?\)', '(?...)', statement)
+
+class Context:
+    def __init__(self, app, socketio):
+        self.client = app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['username'] = 'bench1'
+            sess['theme'] = 'cute'
+        self.sio = socketio.test_client(app, flask_test_client=self.client)
+        self.sio.emit('create_room', {'username': 'bench1'})
+        created = [m for m in self.sio.get_received() if m['name'] == 'room_created']
+        self.room = created[-1]['args'][0]['roomId'] if created else 'room_0'
+
+def measure_dataset(users, app_factory=make_app):
+    """Return {endpoint: {'count', 'db_ms', 'statements', 'error'}} for a dataset size"""
+    from app import socketio
+    from models import db
+
+    workdir = tempfile.mkdtemp(prefix='pathfinder-budget-')
+    try:
+        app = app_factory(os.path.join(workdir, 'budget.db'))
+        seed(app, users, levels=10, challenges=users)
+        with app.app_context():
+            # The primary and the read-only pool
+            recorder = StatementRecorder(db.engines.values())
+        ctx = Context(app, socketio)
+        results = {}
+        for name, call in ENDPOINTS:
+            clear_caches()
+            results[name + COLD] = _measure(recorder, lambda: call(ctx))
+            results[name] = _measure(recorder, lambda: call(ctx))
+        ctx.sio.disconnect()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def _measure(recorder, func):
+    error = None
+    try:
+        ok, statements, seconds = recorder.measure(func)
+        if not ok:
+            error = 'server error'
+    except Exception as e:
+        statements, seconds, error = list(recorder.statements), recorder.seconds, f'{type(e).__name__}: {e}'
+    return {
+        'error': error,
+        'count': len(statements),
+        'db_ms': round(seconds * 1000, 3),
+        'statements': statements
+    }
+
+def check(small, large, budgets):
+    """Return a list of failure messages (with statement diffs)"""
+    failures = []
+    for name in large:
+        now = large[name]
+        error = now['error'] or small[name]['error']
+        if error:
+            failures.append(f'{name}: request failed ({error})')
+            continue
+        if small[name]['count'] != now['count']:
+            failures.append(
+                f"{name}: statement count grows with data ({small[name]['count']} at "
+                f'{SMALL_DATASET} users, {now["count"]} at {LARGE_DATASET} users)\n'
+                + _diff(small[name]['statements'], now['statements'], 'small', 'large'))
+        budget = budgets.get(name)
+        if budget is None:
+            failures.append(f'{name}: no budget recorded (run with --update)')
+            continue
+        if now['count'] > budget['max_statements']:
+            failures.append(
+                f"{name}: {now['count']} statements, budget {budget['max_statements']}\n"
+                + _diff(budget.get('statements', []), now['statements'], 'budget', 'actual'))
+        if now['db_ms'] > budget['max_db_ms']:
+            failures.append(f"{name}: {now['db_ms']}ms in DB, budget {budget['max_db_ms']}ms")
+    return failures
+
+def _diff(expected, actual, from_name, to_name):
+    lines = difflib.unified_diff(expected, actual, fromfile=from_name, tofile=to_name, lineterm='')
+    return '\n'.join(f'    {line}' for line in lines)
+
+def make_budgets(large, headroom, current=None):
+    """Budgets for the large run; entries still met unchanged are kept as is"""
+    budgets = {}
+    for name, result in large.items():
+        budget = (current or {}).get(name)
+        # Re-recording only rewrites budgets whose statements changed or are
+        # exceeded, so DB-time noise does not churn unrelated entries
+        if (budget is not None and budget.get('statements') == result['statements']
+                and result['db_ms'] <= budget['max_db_ms']):
+            budgets[name] = budget
+            continue
+        budgets[name] = {
+            'max_statements': result['count'],
+            'max_db_ms': math.ceil(result['db_ms'] * headroom) + 5,
+            'statements': result['statements']
+        }
+    return budgets
+
+def main(argv=None, app_factory=make_app):
+    global SMALL_DATASET, LARGE_DATASET
+    parser = argparse.ArgumentParser(description='Check per-endpoint SQL query budgets.')
+    parser.add_argument('--budgets', default=BUDGET_FILE)
+    parser.add_argument('--update', action='store_true', help='Record current counts as the budgets')
+    parser.add_argument('--small', type=int, default=SMALL_DATASET)
+    parser.add_argument('--large', type=int, default=LARGE_DATASET)
+    parser.add_argument('--headroom', type=float, default=5.0,
+                        help='DB time budget multiplier used with --update')
+    args = parser.parse_args(argv)
+    SMALL_DATASET, LARGE_DATASET = args.small, args.large
+
+    small = measure_dataset(args.small, app_factory)
+    large = measure_dataset(args.large, app_factory)
+
+    for name, result in large.items():
+        status = '  FAILED' if result['error'] else ''
+        print(f"{name:35} {result['count']:3} statements {result['db_ms']:9.3f} ms{status}")
+
+    budgets = {}
+    if os.path.exists(args.budgets):
+        with open(args.budgets) as fh:
+            budgets = json.load(fh)
+
+    if args.update:
+        # Failed endpoints keep their previous budget
+        failed = [name for name in large if large[name]['error'] or small[name]['error']]
+        budgets.update(make_budgets({name: result for name, result in large.items()
+                                     if name not in failed}, args.headroom, budgets))
+        with open(args.budgets, 'w') as fh:
+            json.dump(budgets, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+        print(f'Budgets written to {args.budgets}')
+        for name in failed:
+            print(f"  {name}: request failed ({large[name]['error'] or small[name]['error']}), budget not updated")
+        return 1 if failed else 0
+
+    failures = check(small, large, budgets)
+    if failures:
+        print('QUERY BUDGET FAILURES:')
+        for failure in failures:
+            print(f'  {failure}')
+        return 1
+    print('All endpoints within budget.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
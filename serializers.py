@@ -0,0 +1,113 @@
+"""Bulk serialization straight from column-projected row tuples.
+
+The to_dict() methods need fully hydrated ORM instances and build one dict
+per object through attribute access, which dominates list responses with
+thousands of rows. A RowEncoder describes the same payload as a list of
+column expressions. It projects just those columns and turns each result
+tuple into the to_dict() shape with a function compiled once per encoder:
+positional indexing, isoformat() only for DateTime columns, and no ORM
+state at all.
+
+stream_json() sends a large result as a JSON array in chunks. Rows are
+fetched with yield_per and each chunk is encoded by one C json call, so
+memory stays flat however many rows there are.
+"""
+import json
+
+from flask import Response, stream_with_context
+from sqlalchemy.orm import aliased
+
+from models import db, User, GameProgress, CodeSubmission, MultiplayerMatch, Leaderboard
+
+DEFAULT_CHUNK_SIZE = 1000
+
+_encoder = json.JSONEncoder(separators=(',', ':'))
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+class RowEncoder:
+    """Precompiled row tuple -> dict encoder for one payload shape.
+
+    Keys come from each column's key or label. Extra trailing columns in a
+    row (e.g. keyset sort keys) are ignored.
+    """
+    __slots__ = ('name', 'columns', 'keys', 'encode')
+
+    def __init__(self, name, *columns):
+        self.name = name
+        self.columns = columns
+        self.keys = tuple(column.key for column in columns)
+        items = []
+        for index, column in enumerate(columns):
+            value = f'row[{index}]'
+            if isinstance(column.type, db.DateTime):
+                value = f'_iso({value})'
+            items.append(f'{column.key!r}: {value}')
+        source = 'def encode(row):\n    return {%s}\n' % ', '.join(items)
+        namespace = {'_iso': _iso}
+        exec(compile(source, f'<encoder {name}>', 'exec'), namespace)
+        self.encode = namespace['encode']
+
+    def encode_all(self, rows):
+        return list(map(self.encode, rows))
+
+    def query(self, *extra):
+        """A session query projecting this encoder's columns (plus extras)"""
+        return db.session.query(*self.columns, *extra)
+
+MATCH_PLAYER1 = aliased(User, name='player1')
+MATCH_PLAYER2 = aliased(User, name='player2')
+MATCH_WINNER = aliased(User, name='winner')
+
+USER = RowEncoder(
+    'user', User.id, User.username, User.email, User.theme_preference, User.created_at, User.last_login)
+
+GAME_PROGRESS = RowEncoder(
+    'game_progress', GameProgress.id, GameProgress.user_id, GameProgress.level, GameProgress.score,
+    GameProgress.completed_at, GameProgress.time_taken, GameProgress.attempts)
+
+CODE_SUBMISSION = RowEncoder(
+    'code_submission', CodeSubmission.id, CodeSubmission.user_id, CodeSubmission.challenge_id,
+    CodeSubmission.language, CodeSubmission.status, CodeSubmission.output, CodeSubmission.error_message,
+    CodeSubmission.execution_time, CodeSubmission.memory_used, CodeSubmission.submitted_at)
+
+LEADERBOARD = RowEncoder(
+    'leaderboard', User.username, Leaderboard.total_score, Leaderboard.levels_completed,
+    Leaderboard.multiplayer_rating)
+
+MULTIPLAYER_MATCH = RowEncoder(
+    'multiplayer_match', MultiplayerMatch.id, MultiplayerMatch.room_id,
+    MATCH_PLAYER1.username.label('player1'), MATCH_PLAYER2.username.label('player2'),
+    MultiplayerMatch.status, MATCH_WINNER.username.label('winner'),
+    MultiplayerMatch.player1_score, MultiplayerMatch.player2_score,
+    MultiplayerMatch.start_time, MultiplayerMatch.end_time)
+
+def match_query(*extra):
+    """Projected MultiplayerMatch query with the player usernames joined in"""
+    return MULTIPLAYER_MATCH.query(*extra) \
+        .join(MATCH_PLAYER1, MATCH_PLAYER1.id == MultiplayerMatch.player1_id) \
+        .outerjoin(MATCH_PLAYER2, MATCH_PLAYER2.id == MultiplayerMatch.player2_id) \
+        .outerjoin(MATCH_WINNER, MATCH_WINNER.id == MultiplayerMatch.winner_id)
+
+def iter_json_array(rows, encoder, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield a JSON array of encoded rows as text chunks"""
+    encode = encoder.encode
+    yield '['
+    chunk = []
+    first = True
+    for row in rows:
+        chunk.append(encode(row))
+        if len(chunk) >= chunk_size:
+            yield ('' if first else ',') + _encoder.encode(chunk)[1:-1]
+            chunk.clear()
+            first = False
+    if chunk:
+        yield ('' if first else ',') + _encoder.encode(chunk)[1:-1]
+    yield ']'
+
+def stream_json(query, encoder, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream a projected query as a chunked JSON array response"""
+    rows = query.yield_per(chunk_size)
+    return Response(stream_with_context(iter_json_array(rows, encoder, chunk_size)),
+                    mimetype='application/json')
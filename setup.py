@@ -33,6 +33,13 @@ setup(
     entry_points={
         "console_scripts": [
             "pathfinder-init=scripts.init_db:main",
+            "pathfinder-load-challenges=scripts.load_challenges:main",
+            "pathfinder-export=scripts.export_data:main",
+            "pathfinder-import=scripts.import_data:main",
+            "pathfinder-backfill-analytics=scripts.backfill_analytics:main",
+            "pathfinder-index-submissions=scripts.index_submissions:main",
+            "pathfinder-archive=scripts.archive_data:main",
+            "pathfinder-backfill-skills=scripts.backfill_skills:main",
         ],
     },
 )
\ No newline at end of file
@@ -0,0 +1,348 @@
+"""Near-duplicate detection for code submissions with MinHash-LSH.
+
+Each submission is reduced to a set of shingles:
+
+- Python: runs of SHINGLE_SIZE node types from a pre-order walk of the AST.
+  Identifier names and literal values are dropped, so renaming variables
+  does not hide a copy.
+- HTML: runs of open/close tags from the tag tree.
+- Anything else, or Python that fails to parse: runs of lexical tokens, with
+  names and literals normalized.
+
+Shingles that also appear in the challenge's starter code are removed, so
+the template every student starts from does not make all submissions look
+alike.
+
+The shingle set is summarized by a NUM_HASHES-value MinHash signature. The
+share of equal values in two signatures estimates the Jaccard similarity
+of their shingle sets. The signature is split into BANDS bands, and each
+band's hash is stored in submission_lsh_buckets. Two submissions to the
+same challenge become candidates when any band hash matches. That is
+likely above about 0.6 similarity and unlikely well below it, so finding
+the near-duplicates of a submission reads a handful of buckets instead of
+every earlier submission. Candidates are then confirmed against
+SIMILARITY_THRESHOLD using the signatures.
+
+    flask --app "app:create_app()" index-submissions
+    GET /admin/similarity/challenges/<challenge_id>
+"""
+import ast
+import io
+import re
+import tokenize
+import zlib
+from html.parser import HTMLParser
+
+from functools import lru_cache
+
+from flask import Blueprint, abort, current_app, jsonify, request
+
+from catalog import catalog
+from db_routing import read_only
+from models import db, CodeSubmission, SubmissionFingerprint, SubmissionLSHBucket
+from profiling import is_admin
+
+SHINGLE_SIZE = 4
+NUM_HASHES = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_HASHES // BANDS
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_CHUNK_SIZE = 500
+EXACT_BUCKET_NODES = 100
+
+_PRIME = (1 << 31) - 1
+
+_LEXICAL_TOKEN = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|\d+(?:\.\d+)?|"[^"]*"|\'[^\']*\'|\S')
+_KEYWORDS = frozenset(('if', 'else', 'for', 'while', 'return', 'function', 'def', 'class',
+                       'var', 'let', 'const', 'import', 'from', 'in', 'and', 'or', 'not'))
+
+def _ast_tokens(source):
+    def walk(node):
+        yield type(node).__name__
+        for child in ast.iter_child_nodes(node):
+            yield from walk(child)
+    return list(walk(ast.parse(source)))
+
+def _python_lexical_tokens(source):
+    tokens = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(source).readline):
+            if token.type == tokenize.NAME:
+                tokens.append(token.string if token.string in _KEYWORDS else 'ID')
+            elif token.type in (tokenize.NUMBER, tokenize.STRING):
+                tokens.append('LIT')
+            elif token.type == tokenize.OP:
+                tokens.append(token.string)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        pass
+    return tokens or _lexical_tokens(source)
+
+def _lexical_tokens(source):
+    tokens = []
+    for token in _LEXICAL_TOKEN.findall(source):
+        if token[0].isalpha() or token[0] == '_':
+            tokens.append(token if token in _KEYWORDS else 'ID')
+        elif token[0].isdigit() or token[0] in '"\'':
+            tokens.append('LIT')
+        else:
+            tokens.append(token)
+    return tokens
+
+class _TagTree(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.tokens = []
+
+    def handle_starttag(self, tag, attrs):
+        self.tokens.append(f'<{tag}')
+        self.tokens.extend(f'@{name}' for name, _ in sorted(attrs))
+
+    def handle_endtag(self, tag):
+        self.tokens.append(f'</{tag}')
+
+def tokens_for(code, language):
+    """Normalized token stream for a submission"""
+    language = (language or 'python').lower()
+    if language == 'html':
+        parser = _TagTree()
+        parser.feed(code)
+        parser.close()
+        return parser.tokens
+    if language == 'python':
+        try:
+            return _ast_tokens(code)
+        except (SyntaxError, ValueError, RecursionError):
+            return _python_lexical_tokens(code)
+    return _lexical_tokens(code)
+
+def shingles(code, language):
+    """Set of 32-bit shingle hashes"""
+    tokens = tokens_for(code or '', language)
+    if len(tokens) < SHINGLE_SIZE:
+        return {zlib.crc32(' '.join(tokens).encode())} if tokens else set()
+    return {zlib.crc32(' '.join(tokens[i:i + SHINGLE_SIZE]).encode())
+            for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+@lru_cache(maxsize=None)
+def _hash_params():
+    # numpy is imported on first use to keep it out of app start-up. The seed
+    # is fixed because stored signatures must stay comparable
+    import numpy as np
+
+    rng = np.random.RandomState(20240601)
+    return (rng.randint(1, _PRIME, size=NUM_HASHES).astype(np.uint64)[:, None],
+            rng.randint(0, _PRIME, size=NUM_HASHES).astype(np.uint64)[:, None])
+
+def signature(shingle_set):
+    """MinHash signature (NUM_HASHES uint64 values) of a shingle set"""
+    import numpy as np
+
+    if not shingle_set:
+        return np.full(NUM_HASHES, _PRIME, dtype=np.uint64)
+    a, b = _hash_params()
+    values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+    return ((a * values[None, :] + b) % _PRIME).min(axis=1)
+
+def from_bytes(data):
+    """Signature array from its stored bytes"""
+    import numpy as np
+
+    return np.frombuffer(data, dtype=np.uint64)
+
+def band_hashes(sig):
+    """One hash per LSH band of a signature"""
+    return [zlib.crc32(band.tobytes()) for band in sig.reshape(BANDS, ROWS_PER_BAND)]
+
+def estimate_similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return float((sig_a == sig_b).sum()) / NUM_HASHES
+
+def _starter_shingles(challenge_id, language, cache):
+    if challenge_id not in cache:
+        entry = catalog.get(challenge_id)
+        starter = entry.payload.get('starter_code') if entry else None
+        cache[challenge_id] = shingles(starter, language) if starter else set()
+    return cache[challenge_id]
+
+def _threshold():
+    return current_app.config.get('SIMILARITY_THRESHOLD', DEFAULT_THRESHOLD)
+
+def fingerprint_rows(rows, starter_cache=None):
+    """Fingerprint and bucket rows of (id, user_id, challenge_id, code, language)"""
+    starter_cache = {} if starter_cache is None else starter_cache
+    fingerprints, buckets = [], []
+    for submission_id, user_id, challenge_id, code, language in rows:
+        shingle_set = shingles(code, language) - _starter_shingles(challenge_id, language, starter_cache)
+        sig = signature(shingle_set)
+        fingerprints.append({'submission_id': submission_id, 'challenge_id': challenge_id,
+                             'user_id': user_id, 'signature': sig.tobytes()})
+        if shingle_set:
+            buckets.extend({'challenge_id': challenge_id, 'band': band, 'bucket_hash': bucket_hash,
+                            'submission_id': submission_id}
+                           for band, bucket_hash in enumerate(band_hashes(sig)))
+    if fingerprints:
+        db.session.bulk_insert_mappings(SubmissionFingerprint, fingerprints)
+        db.session.bulk_insert_mappings(SubmissionLSHBucket, buckets)
+    return len(fingerprints)
+
+def index_submission(submission):
+    """Fingerprint one new submission (caller commits)"""
+    return fingerprint_rows([(submission.id, submission.user_id, submission.challenge_id,
+                              submission.code, submission.language)])
+
+def index_pending(chunk_size=DEFAULT_CHUNK_SIZE):
+    """Fingerprint every submission that has none yet; returns the count"""
+    indexed = 0
+    last_id = 0
+    starter_cache = {}
+    while True:
+        rows = db.session.query(
+            CodeSubmission.id, CodeSubmission.user_id, CodeSubmission.challenge_id,
+            CodeSubmission.code, CodeSubmission.language
+        ).outerjoin(SubmissionFingerprint, SubmissionFingerprint.submission_id == CodeSubmission.id) \
+         .filter(SubmissionFingerprint.submission_id.is_(None), CodeSubmission.id > last_id) \
+         .order_by(CodeSubmission.id).limit(chunk_size).all()
+        if not rows:
+            return indexed
+        indexed += fingerprint_rows(rows, starter_cache)
+        db.session.commit()
+        last_id = rows[-1][0]
+
+def _signatures(submission_ids):
+    rows = db.session.query(
+        SubmissionFingerprint.submission_id, SubmissionFingerprint.user_id, SubmissionFingerprint.signature
+    ).filter(SubmissionFingerprint.submission_id.in_(submission_ids))
+    return {sid: (user_id, from_bytes(sig)) for sid, user_id, sig in rows}
+
+def near_duplicates(submission_id, threshold=None):
+    """[(other_submission_id, similarity)] above threshold, most similar first"""
+    threshold = _threshold() if threshold is None else threshold
+    own = db.session.query(SubmissionLSHBucket.challenge_id, SubmissionLSHBucket.band,
+                           SubmissionLSHBucket.bucket_hash) \
+        .filter(SubmissionLSHBucket.submission_id == submission_id).subquery()
+    candidates = [sid for (sid,) in db.session.query(SubmissionLSHBucket.submission_id).distinct().join(
+        own, (own.c.challenge_id == SubmissionLSHBucket.challenge_id) & (own.c.band == SubmissionLSHBucket.band)
+        & (own.c.bucket_hash == SubmissionLSHBucket.bucket_hash)
+    ).filter(SubmissionLSHBucket.submission_id != submission_id)]
+    if not candidates:
+        return []
+    signatures = _signatures(candidates + [submission_id])
+    mine = signatures.pop(submission_id)[1]
+    matches = [(sid, estimate_similarity(mine, sig)) for sid, (_, sig) in signatures.items()]
+    return sorted([m for m in matches if m[1] >= threshold], key=lambda m: (-m[1], m[0]))
+
+def clusters(challenge_id, threshold=None):
+    """Groups of submissions by different users that are near-duplicates.
+
+    Submissions with identical signatures are collapsed into one node first.
+    Nodes sharing an LSH bucket are compared pairwise while the bucket holds
+    at most EXACT_BUCKET_NODES of them. In a larger bucket a node is only
+    compared with the bucket's leaders (the nodes that matched no earlier
+    leader), so the work grows with the bucket size rather than its square.
+    Matching nodes are merged with union-find.
+    """
+    threshold = _threshold() if threshold is None else threshold
+    rows = db.session.query(
+        SubmissionLSHBucket.band, SubmissionLSHBucket.bucket_hash, SubmissionLSHBucket.submission_id
+    ).filter(SubmissionLSHBucket.challenge_id == challenge_id)
+    buckets = {}
+    for band, bucket_hash, sid in rows:
+        buckets.setdefault((band, bucket_hash), []).append(sid)
+    buckets = [members for members in buckets.values() if len(members) > 1]
+    if not buckets:
+        return []
+
+    signatures = _signatures({sid for members in buckets for sid in members})
+    node_of, nodes = {}, {}
+    for sid in sorted(signatures):
+        user_id, sig = signatures[sid]
+        key = node_of[sid] = sig.tobytes()
+        node = nodes.setdefault(key, {'sig': sig, 'sids': [], 'users': set()})
+        node['sids'].append(sid)
+        node['users'].add(user_id)
+
+    edges = {}
+    for members in buckets:
+        keys = list(dict.fromkeys(node_of[sid] for sid in sorted(members)))
+        exact = len(keys) <= EXACT_BUCKET_NODES
+        leaders = []
+        for key in keys:
+            matched = False
+            for leader in leaders:
+                pair = (leader, key) if leader < key else (key, leader)
+                if pair not in edges:
+                    edges[pair] = estimate_similarity(nodes[leader]['sig'], nodes[key]['sig'])
+                if edges[pair] >= threshold:
+                    matched = True
+            if exact or not matched:
+                leaders.append(key)
+
+    parent = {}
+
+    def find(key):
+        while parent.get(key, key) != key:
+            key = parent[key]
+        return key
+
+    neighbours = {}
+    for (left, right), similarity in edges.items():
+        # A student's own resubmissions are expected to be similar
+        if similarity < threshold or len(nodes[left]['users'] | nodes[right]['users']) < 2:
+            continue
+        neighbours.setdefault(left, []).append((right, similarity))
+        neighbours.setdefault(right, []).append((left, similarity))
+        root_left, root_right = find(left), find(right)
+        if root_left != root_right:
+            parent[root_right] = root_left
+
+    groups = {}
+    for key, node in nodes.items():
+        links = [(key, 1.0)] + neighbours.get(key, [])
+        for sid in node['sids']:
+            user_id = signatures[sid][0]
+            matches = [similarity for other, similarity in links if nodes[other]['users'] - {user_id}]
+            if matches:
+                groups.setdefault(find(key), []).append((sid, user_id, max(matches)))
+    result = []
+    for members in groups.values():
+        members.sort()
+        result.append({
+            'submissions': [{'id': sid, 'user_id': user_id, 'max_similarity': best}
+                            for sid, user_id, best in members],
+            'users': len({user_id for _, user_id, _ in members}),
+            'max_similarity': max(best for _, _, best in members)
+        })
+    result.sort(key=lambda cluster: (-cluster['users'], -cluster['max_similarity']))
+    return result
+
+similarity_bp = Blueprint('similarity', __name__, url_prefix='/admin/similarity')
+
+@similarity_bp.before_request
+def _require_admin():
+    if not is_admin():
+        abort(403)
+
+def _requested_threshold():
+    threshold = request.args.get('threshold', type=float)
+    if threshold is not None and not 0.0 < threshold <= 1.0:
+        abort(400)
+    return threshold
+
+@similarity_bp.route('/challenges/<int:challenge_id>')
+@read_only
+def challenge_clusters(challenge_id):
+    return jsonify({'challenge_id': challenge_id,
+                    'clusters': clusters(challenge_id, _requested_threshold())})
+
+@similarity_bp.route('/submissions/<int:submission_id>')
+@read_only
+def submission_matches(submission_id):
+    if db.session.get(SubmissionFingerprint, submission_id) is None:
+        abort(404)
+    matches = near_duplicates(submission_id, _requested_threshold())
+    return jsonify({'submission_id': submission_id,
+                    'matches': [{'id': sid, 'similarity': similarity} for sid, similarity in matches]})
+
+def init_app(app):
+    """Register the admin similarity endpoints"""
+    app.register_blueprint(similarity_bp)
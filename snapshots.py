@@ -0,0 +1,194 @@
+"""Versioned JSON snapshots for the polled leaderboard and stats APIs.
+
+Clients poll /leaderboard and /user_stats. Each answer is serialized to
+JSON bytes once and reused, with an ETag (a hash of the bytes) and a
+Last-Modified time. A client that sends If-None-Match or If-Modified-Since
+for the current snapshot gets a 304 without the database being touched.
+
+Leaderboard pages are rebuilt when a commit in this process changes a
+Leaderboard or User row, and otherwise at most once every
+LEADERBOARD_SNAPSHOT_INTERVAL seconds, which picks up writes from other
+workers. Stats snapshots live on the cached UserSnapshot, so they follow
+user_context's TTL and invalidation.
+
+Socket.IO clients can emit subscribe_leaderboard instead of polling. They
+receive the first page once as leaderboard_snapshot. After that, every
+rebuild of the first page that changes it is pushed as leaderboard_changed,
+carrying only the changed rows (with their rank) and the usernames that
+dropped off the page.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import Response, request
+from flask_socketio import emit, join_room
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, User, Leaderboard
+from pagination import paginate, parse_limit
+from serializers import LEADERBOARD
+
+LEADERBOARD_ROOM = 'leaderboard'
+DEFAULT_INTERVAL = 5.0
+DEFAULT_PAGES = 256
+
+class JSONSnapshot:
+    """Serialized response body with its validators"""
+    __slots__ = ('data', 'body', 'etag', 'last_modified', 'headers', 'version', 'built_at')
+
+    def __init__(self, data, headers=None, version=None, previous=None):
+        self.data = data
+        self.body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        self.etag = hashlib.sha1(self.body).hexdigest()[:20]
+        # Keep the old timestamp when a rebuild produced identical bytes
+        if previous is not None and previous.etag == self.etag:
+            self.last_modified = previous.last_modified
+        else:
+            self.last_modified = datetime.utcnow().replace(microsecond=0)
+        self.headers = headers or {}
+        self.version = version
+        self.built_at = time.monotonic()
+
+def conditional_response(snapshot):
+    """Serve a snapshot, or a bodyless 304 if the client already has it"""
+    response = Response(snapshot.body, mimetype='application/json')
+    response.headers.extend(snapshot.headers)
+    response.set_etag(snapshot.etag)
+    response.last_modified = snapshot.last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def _leaderboard_page(cursor, limit):
+    # Project only the payload columns plus the keyset (total_score, id); the
+    # username comes from a join rather than a lazy load per row
+    query = LEADERBOARD.query(Leaderboard.total_score, Leaderboard.id) \
+        .join(User, User.id == Leaderboard.user_id)
+    rows, next_cursor = paginate(query, [Leaderboard.total_score, Leaderboard.id], cursor, limit)
+    return LEADERBOARD.encode_all(rows), {'X-Next-Cursor': next_cursor} if next_cursor else None
+
+class LeaderboardSnapshots:
+    """Per-page leaderboard snapshots plus the leaderboard_changed push"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pages = OrderedDict()
+        self._version = 0
+        self._watcher = None
+        self.app = None
+        self.socketio = None
+        self.interval = DEFAULT_INTERVAL
+        self.max_pages = DEFAULT_PAGES
+
+    def init_app(self, app, socketio):
+        self.app = app
+        self.socketio = socketio
+        self.interval = app.config.get('LEADERBOARD_SNAPSHOT_INTERVAL', DEFAULT_INTERVAL)
+        self.max_pages = app.config.get('LEADERBOARD_SNAPSHOT_PAGES', DEFAULT_PAGES)
+        self.clear()
+        app.extensions['leaderboard_snapshots'] = self
+
+    @property
+    def first_page(self):
+        return (None, parse_limit(None))
+
+    def mark_changed(self):
+        """Invalidate every page; called after a commit touching the leaderboard"""
+        self._version += 1
+
+    def _fresh(self, snapshot):
+        return (snapshot is not None and snapshot.version == self._version
+                and time.monotonic() - snapshot.built_at < self.interval)
+
+    def get(self, cursor, limit):
+        """Return the JSONSnapshot for a page, rebuilding it if stale.
+
+        Raises InvalidCursor for a malformed cursor.
+        """
+        key = (cursor, limit)
+        snapshot = self._pages.get(key)
+        if self._fresh(snapshot):
+            return snapshot
+        with self._lock:
+            snapshot = self._pages.get(key)
+            if self._fresh(snapshot):
+                return snapshot
+            version = self._version
+            data, headers = _leaderboard_page(cursor, limit)
+            previous, snapshot = snapshot, JSONSnapshot(data, headers, version, snapshot)
+            self._pages[key] = snapshot
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        if key == self.first_page and previous is not None and previous.etag != snapshot.etag:
+            self._publish(previous.data, snapshot.data)
+        return snapshot
+
+    def _publish(self, old_rows, new_rows):
+        old = {row['username']: (rank, row) for rank, row in enumerate(old_rows, 1)}
+        changed = [dict(row, rank=rank) for rank, row in enumerate(new_rows, 1)
+                   if old.get(row['username']) != (rank, row)]
+        current = {row['username'] for row in new_rows}
+        removed = [username for username in old if username not in current]
+        if self.socketio is not None and (changed or removed):
+            self.socketio.emit('leaderboard_changed', {'changed': changed, 'removed': removed},
+                               to=LEADERBOARD_ROOM)
+
+    def subscribe(self):
+        """Join the caller to the push room and send the current first page"""
+        join_room(LEADERBOARD_ROOM)
+        snapshot = self.get(*self.first_page)
+        emit('leaderboard_snapshot', {'rows': snapshot.data, 'etag': snapshot.etag})
+        if self._watcher is None:
+            with self._lock:
+                if self._watcher is None:
+                    self._watcher = self.socketio.start_background_task(self._watch)
+
+    def _watch(self):
+        # Rebuilds the first page once per interval so changes made by other
+        # workers reach subscribers without anyone polling this one
+        while True:
+            self.socketio.sleep(self.interval)
+            try:
+                with self.app.app_context():
+                    self.get(*self.first_page)
+            except Exception as e:
+                self.app.logger.warning('Leaderboard refresh failed: %s', e)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+leaderboard_snapshots = LeaderboardSnapshots()
+
+def stats_snapshot(user, build):
+    """The JSONSnapshot of a user's stats, built once per cached UserSnapshot"""
+    if user.stats_json is None:
+        user.stats_json = JSONSnapshot(build())
+    return user.stats_json
+
+# Drop leaderboard snapshots when a committed transaction changed a ranked row
+
+_DIRTY_KEY = 'leaderboard_snapshots_dirty'
+
+@event.listens_for(Session, 'after_flush')
+def _track_leaderboard_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Leaderboard) or (
+                isinstance(obj, User) and (obj not in session.dirty
+                                           or db.inspect(obj).attrs.username.history.has_changes())):
+            session.info[_DIRTY_KEY] = True
+            return
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    if session.info.pop(_DIRTY_KEY, False):
+        leaderboard_snapshots.mark_changed()
+
+@event.listens_for(Session, 'after_rollback')
+def _clear_on_rollback(session):
+    session.info.pop(_DIRTY_KEY, None)
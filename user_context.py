@@ -0,0 +1,168 @@
+"""Request- and connection-scoped user context backed by a short-TTL cache.
+
+Handlers call current_user() instead of User.query.get(session['user_id']).
+A lookup goes through three levels:
+
+1. flask.g for the rest of the current request or Socket.IO event
+2. the Socket.IO connection (request.sid) while the client stays connected
+3. a process-wide LRU of hot user records that expire after USER_CACHE_TTL
+   seconds
+
+Only on a miss at all three levels is the users table queried. Progress
+stats are loaded on first use and cached in the same record.
+invalidate(user_id) drops the record after a profile, theme or progress
+change. Other workers see the change once their TTL runs out.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, has_request_context, request, session
+
+from models import db, User, GameProgress, MultiplayerStats, ArchiveSummary
+
+DEFAULT_TTL = 10.0
+DEFAULT_SIZE = 10000
+
+class UserSnapshot:
+    """Read-only view of the fields handlers need on most requests"""
+    __slots__ = ('id', 'username', 'theme', 'is_admin', 'is_active', 'stats', 'stats_json', 'loaded_at')
+
+    def __init__(self, id, username, theme, is_admin, is_active):
+        self.id = id
+        self.username = username
+        self.theme = theme or 'cute'
+        self.is_admin = bool(is_admin)
+        self.is_active = bool(is_active) if is_active is not None else True
+        self.stats = None
+        self.stats_json = None
+        self.loaded_at = time.monotonic()
+
+class UserCache:
+    """Bounded LRU of UserSnapshots with a time-to-live"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._connections = {}
+
+    def get(self, user_id, ttl):
+        with self._lock:
+            snapshot = self._entries.get(user_id)
+            if snapshot is None:
+                return None
+            if time.monotonic() - snapshot.loaded_at > ttl:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return snapshot
+
+    def put(self, snapshot, size):
+        with self._lock:
+            self._entries[snapshot.id] = snapshot
+            self._entries.move_to_end(snapshot.id)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def get_connection(self, sid, ttl):
+        snapshot = self._connections.get(sid)
+        if snapshot is not None and time.monotonic() - snapshot.loaded_at <= ttl:
+            return snapshot
+        return None
+
+    def bind_connection(self, sid, snapshot):
+        self._connections[sid] = snapshot
+
+    def release_connection(self, sid):
+        self._connections.pop(sid, None)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            for sid in [sid for sid, snap in self._connections.items() if snap.id == user_id]:
+                del self._connections[sid]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._connections.clear()
+
+user_cache = UserCache()
+
+def _ttl():
+    return current_app.config.get('USER_CACHE_TTL', DEFAULT_TTL)
+
+def _load(user_id):
+    row = db.session.query(
+        User.id, User.username, User.theme_preference, User.is_admin, User.is_active
+    ).filter(User.id == user_id).first()
+    return UserSnapshot(*row) if row else None
+
+def _socket_sid():
+    return getattr(request, 'sid', None) if has_request_context() else None
+
+def get_user(user_id):
+    """Return the UserSnapshot for user_id, or None if it does not exist"""
+    ttl = _ttl()
+    snapshot = user_cache.get(user_id, ttl)
+    if snapshot is None:
+        snapshot = _load(user_id)
+        if snapshot is not None:
+            user_cache.put(snapshot, current_app.config.get('USER_CACHE_SIZE', DEFAULT_SIZE))
+    return snapshot
+
+def current_user():
+    """The logged-in user's snapshot for this request/event, or None"""
+    if 'current_user' in g:
+        return g.current_user
+    user_id = session.get('user_id')
+    snapshot = None
+    if user_id is not None:
+        sid = _socket_sid()
+        if sid is not None:
+            snapshot = user_cache.get_connection(sid, _ttl())
+        if snapshot is None or snapshot.id != user_id:
+            snapshot = get_user(user_id)
+            if sid is not None and snapshot is not None:
+                user_cache.bind_connection(sid, snapshot)
+    g.current_user = snapshot
+    return snapshot
+
+def user_stats(snapshot):
+    """Progress and multiplayer totals for a user, cached with the snapshot"""
+    if snapshot.stats is None:
+        total_score, levels_completed, highest_level = db.session.query(
+            db.func.sum(GameProgress.score),
+            db.func.count(GameProgress.level),
+            db.func.max(GameProgress.level)
+        ).filter(GameProgress.user_id == snapshot.id).one()
+        # Progress moved to the archive still counts, via its online summaries
+        archived_levels, archived_score, archived_highest = db.session.query(
+            db.func.sum(ArchiveSummary.rows),
+            db.func.sum(ArchiveSummary.score_total),
+            db.func.max(ArchiveSummary.max_level)
+        ).filter(ArchiveSummary.table_name == 'game_progress', ArchiveSummary.user_id == snapshot.id).one()
+        multiplayer = db.session.query(
+            MultiplayerStats.wins, MultiplayerStats.losses, MultiplayerStats.rating
+        ).filter(MultiplayerStats.user_id == snapshot.id).first()
+        snapshot.stats = {
+            'total_score': (total_score or 0) + (archived_score or 0),
+            'levels_completed': (levels_completed or 0) + (archived_levels or 0),
+            'highest_level': max(highest_level or 1, archived_highest or 1),
+            'multiplayer_wins': multiplayer.wins if multiplayer else 0,
+            'multiplayer_losses': multiplayer.losses if multiplayer else 0,
+            'multiplayer_rating': multiplayer.rating if multiplayer else 1000
+        }
+    return snapshot.stats
+
+def invalidate(user_id):
+    """Drop cached data for a user after a profile, theme or progress change"""
+    user_cache.invalidate(user_id)
+    if 'current_user' in g and g.current_user is not None and g.current_user.id == user_id:
+        g.pop('current_user')
+
+def release_connection():
+    """Forget the connection-scoped user when a Socket.IO client disconnects"""
+    sid = _socket_sid()
+    if sid is not None:
+        user_cache.release_connection(sid)